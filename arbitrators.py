@@ -0,0 +1,249 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# Panel members are separated by semicolons, or by commas in panels without any semicolon
+MEMBER_SEPARATORS = re.compile(r"\s*;\s*")
+LIST_SEPARATORS = re.compile(r"\s*,\s*")
+PARENTHESES = re.compile(r"\(([^)]*)\)")
+TITLES = re.compile(r"\b(?:prof|dr|mr|mrs|ms|judge)\b\.?", re.IGNORECASE)
+PRESIDENT_ROLE = re.compile(r"^(?:president|chair(?:man|woman|person)?)$", re.IGNORECASE)
+SOLE_ARBITRATOR_ROLE = re.compile(r"^sole arbitrator$", re.IGNORECASE)
+ARBITRATOR_ROLE = re.compile(r"^(?:co-)?arbitrator$", re.IGNORECASE)
+
+PRESIDENT = "President"
+SOLE_ARBITRATOR = "Sole Arbitrator"
+ARBITRATOR = "Arbitrator"
+
+# Seats a name can be looked up in: the president (or sole arbitrator), the first and second
+# other arbitrators in panel order, or any of them
+SEATS = ("any", "president", "arbitrator1", "arbitrator2")
+
+# Suggestions: how many are returned, and the spelling mistakes tolerated in a typed name
+# (one up to FUZZY_SHORT_LENGTH characters, two beyond)
+SUGGESTION_LIMIT = 8
+FUZZY_SHORT_LENGTH = 5
+
+# Names, sharing the most trigrams with a typed name, whose spelling is compared with it
+FUZZY_CANDIDATES = 20
+
+
+def normalize_name(text):
+    """Lowercase a name, drop its accents and collapse its spaces, for matching ("José" -> "jose")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+def _is_role(text):
+    return bool(PRESIDENT_ROLE.match(text) or SOLE_ARBITRATOR_ROLE.match(text) or ARBITRATOR_ROLE.match(text))
+
+
+def _role_of(text):
+    if PRESIDENT_ROLE.match(text):
+        return PRESIDENT
+    if SOLE_ARBITRATOR_ROLE.match(text):
+        return SOLE_ARBITRATOR
+    return ARBITRATOR
+
+
+def parse_panel(panel):
+    """Parse a free-text panel description into ``(name, role, nationality)`` records, in panel order.
+
+    Both "Prof. Ulrich Haas (President), Mr. Efraim Barak" and "Mr Lars
+    Hilliger (Denmark), President; Mr Pantelis Dedes (Greece)" are
+    understood: a parenthesis or a trailing part naming a role gives the
+    role, any other parenthesis the nationality (None if not given). A
+    single member without a role is the sole arbitrator; other members
+    without one are arbitrators.
+    """
+    panel = panel or ""
+    parts = MEMBER_SEPARATORS.split(panel) if ";" in panel else [panel]
+    members = []    # [name text, role, nationality]
+    for part in parts:
+        for piece in LIST_SEPARATORS.split(part.strip()):
+            if not piece:
+                continue
+            if _is_role(piece) and members:
+                members[-1][1] = _role_of(piece)
+                continue
+            role, nationality = None, None
+            for inside in PARENTHESES.findall(piece):
+                inside = inside.strip()
+                if _is_role(inside):
+                    role = _role_of(inside)
+                elif inside:
+                    nationality = inside
+            name = " ".join(TITLES.sub(" ", PARENTHESES.sub(" ", piece)).split())
+            if name:
+                members.append([name, role, nationality])
+    if len(members) == 1 and members[0][1] is None:
+        members[0][1] = SOLE_ARBITRATOR
+    return [(name, role or ARBITRATOR, nationality) for name, role, nationality in members]
+
+
+def _trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between ``a`` and ``b``, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, start=1):
+        current = [i]
+        for j, other in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class ArbitratorIndex:
+    """The arbitrators of the corpus, with the decision rows of each by seat.
+
+    Names are matched on their normalized form (see normalize_name). A
+    trigram index over the names finds the ones containing a piece of text
+    without scanning them all, and the close spellings of a mistyped name;
+    filters then take the precomputed rows of the matching names.
+    """
+
+    def __init__(self):
+        self.names = []             # display name of each arbitrator id
+        self.keys = []              # normalized name
+        self.nationalities = []     # set of the nationalities given for them
+        self.rows = {seat: [] for seat in SEATS}    # seat -> rows array per arbitrator id
+        self._ids = {}              # normalized name -> arbitrator id
+        self._trigrams = {}         # trigram -> set of arbitrator ids
+
+    @classmethod
+    def from_panels(cls, panels):
+        """Index the panels of the decision rows, in row order."""
+        index = cls()
+        postings = {}               # (arbitrator id, seat) -> rows
+        for row, panel in enumerate(panels):
+            others = 0
+            for name, role, nationality in parse_panel(panel):
+                arbitrator = index._add(name)
+                if nationality:
+                    index.nationalities[arbitrator].add(nationality)
+                if role == ARBITRATOR:
+                    others += 1
+                    seat = f"arbitrator{others}"
+                else:
+                    seat = "president"
+                for key in {(arbitrator, "any"), (arbitrator, seat)}:
+                    rows = postings.setdefault(key, [])
+                    if not rows or rows[-1] != row:
+                        rows.append(row)
+        empty = np.empty(0, dtype=np.int64)
+        for seat in SEATS:
+            index.rows[seat] = [np.asarray(postings.get((arbitrator, seat), empty), dtype=np.int64)
+                                for arbitrator in range(len(index.names))]
+        return index
+
+    def _add(self, name):
+        key = normalize_name(name)
+        arbitrator = self._ids.get(key)
+        if arbitrator is None:
+            arbitrator = self._ids[key] = len(self.names)
+            self.names.append(name)
+            self.keys.append(key)
+            self.nationalities.append(set())
+            for trigram in _trigrams(f" {key} "):
+                self._trigrams.setdefault(trigram, set()).add(arbitrator)
+        return arbitrator
+
+    def extended(self, tail, first_row):
+        """Return a new index with the decisions of ``tail``, an index of the rows from ``first_row`` on, added."""
+        combined = ArbitratorIndex()
+        combined.names, combined.keys = list(self.names), list(self.keys)
+        combined.nationalities = list(self.nationalities)
+        combined.rows = {seat: list(rows) for seat, rows in self.rows.items()}
+        combined._ids = dict(self._ids)
+        # The trigram sets are shared with this index; copy those the new names are added to
+        combined._trigrams = dict(self._trigrams)
+        for key in tail.keys:
+            if key not in self._ids:
+                for trigram in _trigrams(f" {key} "):
+                    if trigram in self._trigrams and combined._trigrams[trigram] is self._trigrams[trigram]:
+                        combined._trigrams[trigram] = set(self._trigrams[trigram])
+        empty = np.empty(0, dtype=np.int64)
+        for arbitrator, name in enumerate(tail.names):
+            merged = combined._add(name)
+            combined.nationalities[merged] = combined.nationalities[merged] | tail.nationalities[arbitrator]
+            for seat in SEATS:
+                if merged == len(combined.rows[seat]):
+                    combined.rows[seat].append(empty)
+                combined.rows[seat][merged] = np.concatenate([combined.rows[seat][merged],
+                                                              tail.rows[seat][arbitrator] + first_row])
+        return combined
+
+    def _candidates(self, pattern):
+        # Arbitrators whose (space-padded) normalized name has every trigram of pattern
+        trigrams = _trigrams(pattern)
+        if not trigrams:
+            return range(len(self.keys))
+        sets = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def containing(self, text):
+        """Ids of the arbitrators whose normalized name contains ``text``."""
+        key = normalize_name(text)
+        if not key:
+            return []
+        return sorted(arbitrator for arbitrator in self._candidates(key) if key in self.keys[arbitrator])
+
+    def matching_rows(self, text, seat="any"):
+        """Sorted decision rows where an arbitrator whose name contains ``text`` sat in ``seat``."""
+        found = [self.rows[seat][arbitrator] for arbitrator in self.containing(text)]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def _word_starts(self, key):
+        # Arbitrators with a word of their name starting with key
+        pattern = " " + key
+        return [arbitrator for arbitrator in self._candidates(pattern) if pattern in " " + self.keys[arbitrator]]
+
+    def _close(self, key, limit):
+        # Arbitrators with a name, one of its words, or the start of either within ``limit`` edits of
+        # key, among those sharing the most trigrams with it
+        shared = {}
+        for trigram in _trigrams(" " + key):
+            for arbitrator in self._trigrams.get(trigram, ()):
+                shared[arbitrator] = shared.get(arbitrator, 0) + 1
+        close = {}
+        for arbitrator in sorted(shared, key=shared.get, reverse=True)[:FUZZY_CANDIDATES]:
+            name = self.keys[arbitrator]
+            if " " in key:
+                candidates = {name, name[:len(key)]}
+            else:
+                words = name.split()
+                candidates = set(words).union(word[:len(key)] for word in words)
+            distance = min(_edit_distance(key, candidate, limit) for candidate in candidates)
+            if distance <= limit:
+                close[arbitrator] = distance
+        return close
+
+    def suggestions(self, text, limit=SUGGESTION_LIMIT):
+        """Up to ``limit`` ``(name, nationalities, decisions)`` for a partly typed, possibly misspelled name.
+
+        Names with a word starting with the text come first, then names
+        containing it, then close spellings; the most
+        frequent arbitrators first within each group.
+        """
+        key = normalize_name(text)
+        if not key:
+            return []
+        ranked = dict.fromkeys(self._word_starts(key), 0)
+        if len(ranked) < limit:
+            for arbitrator in self.containing(key):
+                ranked.setdefault(arbitrator, 1)
+        if len(ranked) < limit:
+            typos = 1 if len(key) <= FUZZY_SHORT_LENGTH else 2
+            for arbitrator, distance in self._close(key, typos).items():
+                ranked.setdefault(arbitrator, 1 + distance)
+        best = sorted(ranked, key=lambda a: (ranked[a], -len(self.rows["any"][a]), self.keys[a]))[:limit]
+        return [(self.names[arbitrator], sorted(self.nationalities[arbitrator]), len(self.rows["any"][arbitrator]))
+                for arbitrator in best]
@@ -0,0 +1,343 @@
+"""Search latency and throughput benchmark on synthetic CAS-style corpora.
+
+Usage:
+    python benchmark.py [--scales 1000,10000,100000] [--rounds 5] [--backend sqlite|memory]
+                        [--semantic] [--output PATH] [--compare BASELINE.json]
+
+For every scale, a synthetic corpus of CAS-style decisions (numbered
+paragraphs, panels, dates, outcomes, keywords) is generated, stored and
+indexed, then a query log mixing the app's example searches with sidebar
+filter combinations is replayed against the search engine (the result
+cache is bypassed, so every query does the full work). Each scale runs in
+its own process so that its peak RSS is measured in isolation.
+
+Reported per scale: corpus build time; p50/p95/p99 latency and queries per
+second, mean time per stage and mean work counters (cases scanned,
+paragraphs scored, chunks emitted) for full searches; p50/p95/p99 for
+filter evaluation and for relevance explanations (as results build them,
+from the indexed passage topics); peak RSS. With --semantic, the corpus is
+also embedded (built-in LSA model) and the query log is replayed in
+semantic and hybrid modes, reporting embedding time, search latency and
+the mean time of each search stage. Results are written as JSON
+(default: benchmark_results/<git revision>.json) and can be compared with
+a previous run via --compare.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from corpus_store import InMemoryCorpusStore, SQLiteCorpusStore
+from live_corpus import CorpusSnapshot
+from explanations import load_taxonomy
+from search_engine import search
+from vector_index import LSA_SAMPLE_SIZE, LSAEncoder, VectorIndex
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results")
+
+# The example searches shown on the app's welcome screen, plus a few lawyer-style queries
+EXAMPLE_QUERIES = [
+    "buy-out clause", "sporting results", "satellite collision", "national security",
+    "contract termination", "compensation", "just cause", "Article 337c", "coach dismissal",
+    "prohibited substance sanction", "FIFA RSTP transfer", "frequency allocation",
+]
+
+# Sidebar filter combinations replayed with every query (empty dict = no filters)
+FILTER_COMBINATIONS = [
+    {},
+    {"selected_sports": ["Football"]},
+    {"selected_years": list(range(2018, 2025))},
+    {"selected_outcomes": ["Appeal dismissed"]},
+    {"selected_categories": ["A - Appeal"], "selected_matters": ["Contract"]},
+    {"start_date": datetime.date(2015, 1, 1), "end_date": datetime.date(2020, 12, 31)},
+    {"president_filter": "haas"},
+    {"selected_sports": ["Cycling", "Athletics"], "selected_outcomes": ["Appeal upheld", "Appeal partially upheld"]},
+]
+
+SPORTS = ["Football", "Football", "Football", "Cycling", "Athletics", "Swimming", "Skiing", "Tennis", "Other"]
+CATEGORIES = [("A", "Appeal")] * 6 + [("O", "First instance"), ("AV", "Advisory opinion")]
+CLUBS = ["Atlético Madrid", "Anorthosis Famagusta", "FC Sion", "Galatasaray", "Olympique Lyonnais",
+         "Al Ahly", "Club Brugge", "Sporting CP", "FC Porto", "Dinamo Zagreb", "Boca Juniors"]
+BODIES = ["FIFA", "UEFA", "UCI", "World Athletics", "FINA", "WADA", "FIS", "ITF", "the National Federation"]
+ATHLETES = ["Diego Costa", "Ernst Middendorp", "Marta Silva", "Jan Novak", "Amina Diallo", "Lukas Weber"]
+ARBITRATORS = [
+    "Prof. Ulrich Haas", "Mr. Efraim Barak", "Mr. José Juan Pintó", "Mr Lars Hilliger", "Mr Pantelis Dedes",
+    "Mr Goetz Eilers", "Prof. Maria Stellanova", "Dr. Henry Orbital", "Ms. Jenna Frequency",
+    "Prof. Massimo Coccia", "Mr. Manfred Nan", "Ms. Annett Rombach", "Dr. Elisabeth Steiner",
+    "Mr. Michele Bernasconi", "Judge Hugh Fraser", "Prof. Luigi Fumagalli", "Mr. Romano Subiotto",
+]
+NATIONALITIES = ["Germany", "Switzerland", "Israel", "Spain", "Denmark", "Greece", "Italy", "Canada", "Austria"]
+OUTCOMES = ["Appeal dismissed", "Appeal upheld", "Appeal partially upheld", "Settlement"]
+TOPICS = ["buy-out clause", "contract termination", "just cause", "compensation", "sporting results",
+          "transfer", "doping", "prohibited substance", "eligibility", "disciplinary sanction",
+          "regulatory authority", "frequency allocation", "satellite collision", "national security"]
+
+SENTENCES = [
+    "The Panel notes that the {topic} must be assessed in light of the applicable regulations.",
+    "According to Article {article} of the {body} Regulations, the {party} bears the burden of proof.",
+    "On {date}, {club} informed {athlete} that the contract was terminated with immediate effect.",
+    "The Appellant argues that the {topic} was freely agreed upon by the parties.",
+    "The Respondent contends that there was no just cause for the termination of the employment contract.",
+    "Under Swiss law (Article 337c of the Swiss Code of Obligations), compensation is due for the remaining term.",
+    "The Panel finds that poor sporting results cannot, as a general rule, justify the dismissal of a coach.",
+    "The amount of EUR {amount} corresponds to the {topic} stipulated in the agreement.",
+    "It is undisputed that {club} is affiliated with {body}, which has its registered office in Switzerland.",
+    "The {party} requested that the Panel set aside the decision rendered by {body} on {date}.",
+    "The sample collected on {date} revealed the presence of a prohibited substance.",
+    "The Panel considers that the sanction imposed is proportionate to the seriousness of the violation.",
+    "The regulatory authority enjoys substantial discretion when deciding on matters of {topic}.",
+    "Considerations of national security may justify certain limitations on commercial activities.",
+    "The Panel is not persuaded by the argument that the {topic} was manifestly disproportionate.",
+    "Both parties were represented by counsel and had equal bargaining power at the time of signing.",
+]
+
+
+def synthetic_decisions(count, seed=0):
+    """Generate ``count`` synthetic CAS-style decisions (deterministic for a given seed)."""
+    rng = random.Random(seed)
+    for number in range(count):
+        year = rng.randint(2010, 2024)
+        code, proc_type = rng.choice(CATEGORIES)
+        club, body = rng.choice(CLUBS), rng.choice(BODIES)
+        panel = rng.sample(ARBITRATORS, 3)
+        outcome = rng.choice(OUTCOMES)
+        topics = rng.sample(TOPICS, 3)
+        date = datetime.date(year, 1, 1) + datetime.timedelta(days=rng.randint(0, 364))
+
+        paragraphs = []
+        for n in range(1, rng.randint(12, 35) + 1):
+            if n in (8, 20):
+                paragraphs.append(rng.choice(["II. PROCEEDINGS BEFORE THE COURT OF ARBITRATION FOR SPORT",
+                                              "III. MERITS", "IV. COSTS"]))
+            sentences = [
+                rng.choice(SENTENCES).format(
+                    topic=rng.choice(topics), article=rng.randint(1, 80), body=body, club=club,
+                    athlete=rng.choice(ATHLETES), party=rng.choice(["Appellant", "Respondent", "Club", "Player"]),
+                    amount=f"{rng.randint(1, 900) * 10000:,}", date=date.strftime("%d %B %Y"),
+                )
+                for _ in range(rng.randint(2, 5))
+            ]
+            paragraphs.append(f"{n}. " + " ".join(sentences))
+
+        yield {
+            "id": f"CAS {year}/{code}/{1000 + number}",
+            "title": f"{club} v. {body}",
+            "date": date.isoformat(),
+            "type": proc_type,
+            "sport": rng.choice(SPORTS),
+            "claimant": club,
+            "respondent": body,
+            "panel": (f"{panel[0]} ({rng.choice(NATIONALITIES)}), President; "
+                      f"{panel[1]} ({rng.choice(NATIONALITIES)}); {panel[2]} ({rng.choice(NATIONALITIES)})"),
+            "decision": f"{outcome}, {body} decision {'confirmed' if 'dismissed' in outcome else 'set aside'}.",
+            "keywords": topics,
+            "paragraphs": paragraphs,
+        }
+
+
+def query_log(rounds, seed=0):
+    """The replayed query log: every example query with every filter combination, shuffled."""
+    rng = random.Random(seed)
+    entries = [(q, f) for q in EXAMPLE_QUERIES for f in FILTER_COMBINATIONS]
+    log = []
+    for _ in range(rounds):
+        rng.shuffle(entries)
+        log.extend(entries)
+    return log
+
+
+def latency_stats(seconds):
+    latencies = np.asarray(seconds) * 1000.0
+    return {
+        "count": int(len(latencies)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def replay(corpus, log, mode="keyword"):
+    """Run every query of ``log``; returns the search latency stats, mean per-stage times and mean counters."""
+    # One untimed pass over the distinct queries warms the page cache and memory maps
+    for query, filters in log[:len(EXAMPLE_QUERIES) * len(FILTER_COMBINATIONS)]:
+        search(corpus, query, filters, mode=mode)
+
+    search_times = []
+    stage_times = {}
+    counter_totals = {}
+    num_results = 0
+    replay_started = time.perf_counter()
+    for query, filters in log:
+        timings, counters = {}, {}
+        t0 = time.perf_counter()
+        results, chunks = search(corpus, query, filters, mode=mode, timings=timings, counters=counters)
+        search_times.append(time.perf_counter() - t0)
+        num_results += len(results)
+        for stage, seconds in timings.items():
+            stage_times.setdefault(stage, []).append(seconds)
+        for name, count in counters.items():
+            counter_totals[name] = counter_totals.get(name, 0) + count
+    replay_seconds = time.perf_counter() - replay_started
+    stages = {stage: float(np.mean(times)) * 1000.0 for stage, times in stage_times.items()}
+    return dict(latency_stats(search_times), qps=len(log) / replay_seconds, avg_results=num_results / len(log),
+                stage_mean_ms=stages, counter_mean={name: total / len(log) for name, total in counter_totals.items()})
+
+
+def run_scale(scale, rounds, backend, seed=0, semantic=False):
+    """Build a corpus of ``scale`` decisions and replay the query log against it."""
+    with tempfile.TemporaryDirectory(prefix="caselens-bench-") as tmp_dir:
+        started = time.perf_counter()
+        if backend == "sqlite":
+            store = SQLiteCorpusStore(os.path.join(tmp_dir, "corpus.sqlite"))
+        else:
+            store = InMemoryCorpusStore()
+        batch = []
+        for decision in synthetic_decisions(scale, seed):
+            batch.append(decision)
+            if len(batch) == 1000:
+                store.add_decisions(batch)
+                batch = []
+        if batch:
+            store.add_decisions(batch)
+        store_seconds = time.perf_counter() - started
+        corpus = CorpusSnapshot.load(store)
+        build_seconds = time.perf_counter() - started
+
+        log = query_log(rounds, seed)
+        result = {"decisions": scale, "paragraphs": int(corpus.index.num_docs), "backend": backend,
+                  "store_seconds": store_seconds, "build_seconds": build_seconds}
+        result["search"] = replay(corpus, log)
+
+        if semantic:
+            started = time.perf_counter()
+            sample = []
+            for _, paragraphs in store.iter_case_paragraphs():
+                sample.extend(paragraphs)
+                if len(sample) >= LSA_SAMPLE_SIZE:
+                    break
+            encoder = LSAEncoder.fit(sample[:LSA_SAMPLE_SIZE])
+            corpus.vectors = VectorIndex.build(encoder, (paragraphs for _, paragraphs in store.iter_case_paragraphs()))
+            result["embed_seconds"] = time.perf_counter() - started
+            result["semantic"] = replay(corpus, log, mode="semantic")
+            result["hybrid"] = replay(corpus, log, mode="hybrid")
+
+        filter_times, explanation_times = [], []
+
+        # Stage micro-benchmarks: filter masks and relevance explanations on their own
+        for query, filters in log:
+            t0 = time.perf_counter()
+            corpus.columns.mask(filters)
+            filter_times.append(time.perf_counter() - t0)
+        taxonomy = load_taxonomy()
+        sample_paragraphs = [corpus.index.paragraph_id(row, 1) for row in range(min(scale, 200))]
+        for i, (query, _) in enumerate(log):
+            para_id = sample_paragraphs[i % len(sample_paragraphs)]
+            t0 = time.perf_counter()
+            taxonomy.explain(query.lower().split(), corpus.index.passage_topic(para_id))
+            explanation_times.append(time.perf_counter() - t0)
+
+        result["filters"] = latency_stats(filter_times)
+        result["explanation"] = latency_stats(explanation_times)
+        result["peak_rss_mb"] = peak_rss_mb()
+        return result
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline):
+    """Print the change of the main metrics against a baseline result file."""
+    print(f"\nComparison with {baseline['revision']} (baseline) -> {current['revision']}")
+    metrics = [("search", "p50_ms"), ("search", "p95_ms"), ("search", "p99_ms"), ("search", "qps"),
+               ("semantic", "p50_ms"), ("semantic", "p99_ms"), ("hybrid", "p50_ms"), ("hybrid", "p99_ms"),
+               ("filters", "p50_ms"), ("explanation", "p50_ms")]
+    for scale, result in current["scales"].items():
+        base = baseline["scales"].get(scale)
+        if base is None:
+            continue
+        print(f"  {scale} decisions:")
+        for section, metric in metrics:
+            if section not in base or section not in result:
+                continue
+            old, new = base[section][metric], result[section][metric]
+            change = (new - old) / old * 100 if old else float("nan")
+            print(f"    {section}.{metric:<8} {old:10.3f} -> {new:10.3f}  ({change:+.1f}%)")
+        old, new = base["peak_rss_mb"], result["peak_rss_mb"]
+        print(f"    peak_rss_mb     {old:10.1f} -> {new:10.1f}  ({(new - old) / old * 100:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CaseLens search on synthetic corpora.")
+    parser.add_argument("--scales", default="1000,10000", help="comma-separated corpus sizes (e.g. 1000,10000,100000)")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over the query log")
+    parser.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite", help="corpus store backend")
+    parser.add_argument("--semantic", action="store_true", help="also embed the corpus and benchmark semantic search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmark_results/<revision>.json)")
+    parser.add_argument("--compare", help="baseline result file to compare against")
+    args = parser.parse_args(argv)
+
+    report = {
+        "revision": git_revision(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rounds": args.rounds,
+        "scales": {},
+    }
+    for scale in (int(s) for s in args.scales.split(",")):
+        # A fresh process per scale keeps each peak RSS measurement independent
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_scale, scale, args.rounds, args.backend, args.seed, args.semantic).result()
+        report["scales"][str(scale)] = result
+        s = result["search"]
+        print(f"{scale:>7} decisions ({result['paragraphs']} paragraphs): built in {result['build_seconds']:.1f}s | "
+              f"search p50 {s['p50_ms']:.2f} ms, p95 {s['p95_ms']:.2f} ms, p99 {s['p99_ms']:.2f} ms, "
+              f"{s['qps']:.0f} q/s | filters p50 {result['filters']['p50_ms']:.3f} ms | "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB")
+        if "semantic" in result:
+            print(f"{'':>7} embedded in {result['embed_seconds']:.1f}s")
+            for mode in ("semantic", "hybrid"):
+                s = result[mode]
+                stages = ", ".join(f"{stage} {ms:.2f}" for stage, ms in s["stage_mean_ms"].items())
+                print(f"{'':>7} {mode}: search p50 {s['p50_ms']:.2f} ms, p95 {s['p95_ms']:.2f} ms, "
+                      f"p99 {s['p99_ms']:.2f} ms, {s['qps']:.0f} q/s | mean stage ms: {stages}")
+
+    output = args.output or os.path.join(RESULTS_DIR, report["revision"] + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
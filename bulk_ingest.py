@@ -0,0 +1,237 @@
+"""Bulk-load CAS award PDFs (or plain-text exports) into the corpus store.
+
+Usage:
+    python bulk_ingest.py DIRECTORY [--store PATH] [--workers N] [--batch-size N] [--checkpoint PATH]
+
+Every ``*.pdf`` and ``*.txt`` file under DIRECTORY is processed by a pool of
+worker processes: text extraction, numbered-paragraph detection and
+metadata parsing (case id, title, parties, date, panel, outcome, keywords)
+all happen in the workers. The parent process writes each finished batch
+to the store and records the files of that batch in a checkpoint file, so
+an interrupted run resumes where it stopped; files that failed (say, PDFs
+while pypdf was missing) are tried again. The new decisions are indexed
+once, at the end, into a single new index segment.
+
+PDF extraction needs the optional ``pypdf`` package; text files do not.
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from case_filters import MATTER_KEYWORDS
+from corpus_store import open_corpus_store
+from ingest import ingest_decisions, parse_date, refresh_index
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF support is optional
+    PdfReader = None
+
+CASE_ID_PATTERN = re.compile(r"\b(CAS|TAS)[\s_]+(\d{4})[/_]([A-Z]{1,3})[/_](\d+)")
+NUMBERED_PARAGRAPH = re.compile(r"^\s*(\d{1,4})\.\s+\S")
+HEADING = re.compile(r"^\s*(?:[IVXLC]+\.|[A-H]\.)\s+[A-Z][A-Z ,'’-]+$")
+OUTCOME_PATTERN = re.compile(r"appeal[^.]*?\b(partially upheld|upheld|dismissed|rejected)\b", re.IGNORECASE)
+PARTIES_SEPARATOR = re.compile(r"\sv\.?\s")
+PANEL_LINE = re.compile(r"^\s*(?:Panel|Sole Arbitrator)\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+
+# Procedure type by case category code
+CATEGORY_TYPES = {"A": "Appeal", "O": "First instance", "AV": "Advisory opinion"}
+
+SPORTS = ["Football", "Cycling", "Athletics", "Swimming", "Skiing", "Tennis", "Basketball", "Ice Hockey", "Rowing"]
+
+STOPWORDS = set("""
+a an and are as at be been by for from had has have he her his in is it its of on or that the their this to
+was were which with not shall any all other such under into than also may its per upon
+""".split())
+
+# Number of keywords kept per decision
+NUM_KEYWORDS = 6
+
+
+def extract_text(path):
+    """Return the plain text of a PDF or text file."""
+    if path.lower().endswith(".pdf"):
+        if PdfReader is None:
+            raise RuntimeError("PDF extraction needs the 'pypdf' package (pip install pypdf)")
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def segment_paragraphs(text):
+    """Split extracted award text into paragraphs.
+
+    Numbered paragraphs ("12. The Panel notes ...") and section headings
+    start a new paragraph; the wrapped lines that follow are joined back
+    together. Text without any numbering falls back to blank-line splitting.
+    """
+    lines = text.splitlines()
+    if sum(1 for line in lines if NUMBERED_PARAGRAPH.match(line)) < 2:
+        return [" ".join(p.split()) for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+    paragraphs, current = [], []
+    for line in lines:
+        if NUMBERED_PARAGRAPH.match(line) or HEADING.match(line):
+            if current:
+                paragraphs.append(" ".join(current))
+            current = [line.strip()]
+        elif line.strip():
+            current.append(line.strip())
+        elif current and HEADING.match(current[0]):
+            paragraphs.append(" ".join(current))
+            current = []
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def extract_keywords(paragraphs):
+    """Pick keywords: matched "Matter" keywords first, then the most frequent content words."""
+    text = " ".join(paragraphs).lower()
+    keywords = [kw for words in MATTER_KEYWORDS.values() for kw in words if kw in text]
+    counts = collections.Counter(
+        word for word in re.findall(r"[a-z][a-z-]{3,}", text) if word not in STOPWORDS
+    )
+    for word, _ in counts.most_common():
+        if len(keywords) >= NUM_KEYWORDS:
+            break
+        if word not in keywords:
+            keywords.append(word)
+    return keywords[:NUM_KEYWORDS]
+
+
+def parse_award(text, source_name=""):
+    """Turn the text of one award into a decision dict in the corpus format."""
+    head = text[:4000]
+    match = CASE_ID_PATTERN.search(head) or CASE_ID_PATTERN.search(source_name)
+    if match is None:
+        raise ValueError("no CAS case number found")
+    case_id = f"CAS {match.group(2)}/{match.group(3)}/{match.group(4)}"
+
+    # The title is the first short line naming the parties ("X v. Y")
+    title = next((" ".join(line.split()) for line in head.splitlines()
+                  if PARTIES_SEPARATOR.search(line) and len(line) < 200), "")
+    claimant, respondent = "", ""
+    if title:
+        parts = PARTIES_SEPARATOR.split(title, maxsplit=1)
+        claimant = parts[0].strip()
+        respondent = parts[1].strip() if len(parts) > 1 else ""
+
+    # Decisions are filtered and faceted by date, so an award without one is reported, not stored
+    date = parse_date(head)
+    if date is None:
+        raise ValueError("no award date found")
+
+    paragraphs = segment_paragraphs(text)
+    panel_match = PANEL_LINE.search(head)
+    outcome = OUTCOME_PATTERN.search(text[len(text) // 2:]) or OUTCOME_PATTERN.search(text)
+    sport = next((s for s in SPORTS if re.search(rf"\b{s}\b", head, re.IGNORECASE)), "Other")
+
+    return {
+        "id": case_id,
+        "title": title or case_id,
+        "date": date,
+        "type": CATEGORY_TYPES.get(match.group(3), "Appeal"),
+        "sport": sport,
+        "claimant": claimant,
+        "respondent": respondent,
+        "panel": panel_match.group(1).strip() if panel_match else "",
+        "decision": f"Appeal {outcome.group(1).lower()}." if outcome else "",
+        "keywords": extract_keywords(paragraphs),
+        "paragraphs": paragraphs,
+    }
+
+
+def process_file(path):
+    """Worker: extract and parse one file. Returns ``(path, decision, error)``."""
+    try:
+        return path, parse_award(extract_text(path), os.path.basename(path)), None
+    except Exception as exc:  # one bad file must not stop the batch
+        return path, None, f"{type(exc).__name__}: {exc}"
+
+
+def find_award_files(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith((".pdf", ".txt")))
+    return sorted(paths)
+
+
+def read_checkpoint(path):
+    """Return the set of files a previous run stored; files that failed are tried again."""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    if not record.get("error"):
+                        done.add(record["path"])
+    return done
+
+
+def bulk_ingest(store, paths, checkpoint_path, workers=None, batch_size=100, log=print):
+    """Extract, parse and store ``paths`` with a process pool; returns a stats dict."""
+    done = read_checkpoint(checkpoint_path)
+    pending = [p for p in paths if p not in done]
+    stats = {"files": len(pending), "skipped": len(paths) - len(pending), "added": 0, "failed": 0}
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        for batch_start in range(0, len(pending), batch_size):
+            batch = pending[batch_start:batch_start + batch_size]
+            decisions, records = [], []
+            for path, decision, error in pool.map(process_file, batch, chunksize=4):
+                if error:
+                    stats["failed"] += 1
+                    log(f"  failed: {path}: {error}")
+                else:
+                    decisions.append(decision)
+                records.append({"path": path, "id": decision["id"] if decision else None, "error": error})
+
+            # Store first, then checkpoint: a crash in between only re-reads files whose ids are skipped
+            stats["added"] += ingest_decisions(store, decisions, update_index=False)
+            for record in records:
+                checkpoint.write(json.dumps(record) + "\n")
+            checkpoint.flush()
+
+            processed = batch_start + len(batch)
+            elapsed = time.perf_counter() - started
+            log(f"{processed}/{len(pending)} files, {processed / elapsed:.1f} docs/s")
+
+    refresh_index(store)
+    stats["seconds"] = time.perf_counter() - started
+    stats["docs_per_second"] = stats["files"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load CAS award PDFs/text files into the corpus store.")
+    parser.add_argument("directory", help="directory searched recursively for .pdf and .txt awards")
+    parser.add_argument("--store", help="corpus store path (default: $CASELENS_CORPUS or data/caselens.sqlite)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=100, help="files written to the store per batch")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <store>.bulk-checkpoint.jsonl)")
+    args = parser.parse_args(argv)
+
+    store = open_corpus_store(args.store)
+    if store.index_dir is None:
+        parser.error("the corpus store is read-only (in-memory); point --store at a SQLite file")
+    checkpoint_path = args.checkpoint or store.path + ".bulk-checkpoint.jsonl"
+    paths = find_award_files(args.directory)
+    if PdfReader is None and any(p.lower().endswith(".pdf") for p in paths):
+        print("warning: pypdf is not installed, PDF files will fail", file=sys.stderr)
+
+    stats = bulk_ingest(store, paths, checkpoint_path, workers=args.workers, batch_size=args.batch_size)
+    print(f"Processed {stats['files']} files ({stats['skipped']} already done): {stats['added']} added, "
+          f"{stats['failed']} failed in {stats['seconds']:.1f}s, {stats['docs_per_second']:.1f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from arbitrators import ArbitratorIndex
+
+# Keywords used as a proxy for the "Matter" filter
+MATTER_KEYWORDS = {
+    "Doping": ["doping", "anti-doping", "prohibited substance"],
+    "Transfer": ["transfer", "buy-out", "player registration"],
+    "Contract": ["contract", "employment", "agreement"],
+    "Eligibility": ["eligibility", "qualification"],
+    "Regulatory": ["regulation", "regulatory", "rule"],
+    "Disciplinary": ["disciplinary", "sanction", "suspension"]
+}
+
+# Outcomes offered by the sidebar; each gets a precomputed flag column
+OUTCOME_OPTIONS = ["Appeal upheld", "Appeal partially upheld", "Appeal dismissed", "Settlement"]
+
+# Sidebar filters that show a count of matching decisions next to each option
+FACET_KEYS = ("selected_sports", "selected_years", "selected_proc", "selected_categories",
+              "selected_outcomes", "selected_matters")
+
+# The year column's value for a case without a date
+NO_YEAR = 0
+
+# Arbitrator filters and the panel seat each one looks in (see arbitrators.SEATS)
+ARBITRATOR_FILTERS = {
+    "any_arbitrator_filter": "any",
+    "president_filter": "president",
+    "arbitrator1_filter": "arbitrator1",
+    "arbitrator2_filter": "arbitrator2",
+}
+
+
+def category_code(option):
+    """The category code of a sidebar category option ("A" for "A - Appeal")."""
+    return option.split(" -")[0]
+
+
+def _packed(mask):
+    # A boolean case mask as a bitset of uint64 words, for AND-ing and bit counting
+    bits = np.packbits(mask, bitorder="little")
+    padded = np.zeros(-(-len(bits) // 8) * 8, dtype=np.uint8)
+    padded[:len(bits)] = bits
+    return padded.view(np.uint64)
+
+
+def case_category(case_id):
+    """Guess the procedure category code from the case id ("A" in "CAS 2020/A/6978")."""
+    parts = case_id.split("/")
+    return parts[1] if len(parts) >= 3 else ""
+
+
+class CaseColumns:
+    """Typed, precomputed filter columns over the decision corpus.
+
+    Everything the sidebar filters look at is parsed once, when the corpus
+    is loaded, so a filter state is evaluated as a handful of vectorized
+    boolean masks instead of re-parsing each case on every query.
+    """
+
+    def __init__(self, decisions):
+        self.num_cases = len(decisions)
+        self.dates = pd.to_datetime(decisions["date"], format="%Y-%m-%d", errors="coerce").to_numpy(dtype="datetime64[D]")
+        # A case without a date has year NO_YEAR: it passes no date or year filter and is not counted
+        self.years = np.where(np.isnat(self.dates), NO_YEAR,
+                              self.dates.astype("datetime64[Y]").astype(np.int64) + 1970)
+        self.sports = decisions["sport"].to_numpy(dtype=str)
+        self.types = decisions["type"].to_numpy(dtype=str)
+        self.categories = np.array([case_category(case_id) for case_id in decisions["id"]], dtype=str)
+
+        # Outcome and matter flags, one boolean column per option
+        decision_text = decisions["decision"].fillna("").str.lower()
+        self._decision_text = decision_text
+        self.outcomes = {
+            outcome: decision_text.str.contains(outcome.lower(), regex=False).to_numpy()
+            for outcome in OUTCOME_OPTIONS
+        }
+        keyword_text = decisions["keywords"].map(lambda kws: [kw.lower() for kw in kws or []])
+        self.matters = {
+            matter: keyword_text.map(
+                lambda kws, words=words: any(word in kw for word in words for kw in kws)
+            ).to_numpy(dtype=bool)
+            for matter, words in MATTER_KEYWORDS.items()
+        }
+
+        # Panels parsed into arbitrator records: each arbitrator's rows per seat, and a name index
+        self.arbitrators = ArbitratorIndex.from_panels(decisions["panel"].fillna(""))
+        self._facets = None
+
+    def extended(self, decisions):
+        """Return new columns covering these cases followed by ``decisions`` (the next rows)."""
+        tail = CaseColumns(decisions)
+        combined = copy.copy(self)
+        combined.num_cases = self.num_cases + tail.num_cases
+        for name in ("dates", "years", "sports", "types", "categories"):
+            setattr(combined, name, np.concatenate([getattr(self, name), getattr(tail, name)]))
+        combined._decision_text = pd.concat([self._decision_text, tail._decision_text], ignore_index=True)
+        combined.outcomes = {
+            outcome: np.concatenate([self._outcome_mask(outcome), tail._outcome_mask(outcome)])
+            for outcome in set(self.outcomes) | set(tail.outcomes)
+        }
+        combined.matters = {
+            matter: np.concatenate([self.matters[matter], tail.matters[matter]]) for matter in self.matters
+        }
+        combined.arbitrators = self.arbitrators.extended(tail.arbitrators, self.num_cases)
+        combined._facets = None
+        return combined
+
+    def _outcome_mask(self, outcome):
+        if outcome not in self.outcomes:
+            self.outcomes[outcome] = self._decision_text.str.contains(outcome.lower(), regex=False).to_numpy()
+        return self.outcomes[outcome]
+
+    def _arbitrator_mask(self, text, seat):
+        mask = np.zeros(self.num_cases, dtype=bool)
+        mask[self.arbitrators.matching_rows(text, seat)] = True
+        return mask
+
+    def facets(self):
+        """Per facet (a FACET_KEYS filter), each value's cases as a bitset; built once per columns.
+
+        Returns ``{filter key: (values, bitsets)}``, ``bitsets`` holding one
+        row of uint64 words per value.
+        """
+        if self._facets is None:
+            flags = {
+                "selected_sports": self._value_flags(self.sports),
+                "selected_years": {year: mask for year, mask in self._value_flags(self.years).items()
+                                   if year != NO_YEAR},
+                "selected_proc": self._value_flags(self.types),
+                # "" (no category code) is kept: those cases pass any category filter
+                "selected_categories": self._value_flags(self.categories),
+                "selected_outcomes": {outcome: self._outcome_mask(outcome) for outcome in OUTCOME_OPTIONS},
+                "selected_matters": self.matters,
+            }
+            words = len(_packed(np.zeros(self.num_cases, dtype=bool)))
+            self._facets = {}
+            for key, by_value in flags.items():
+                bitsets = np.empty((len(by_value), words), dtype=np.uint64)
+                for row, mask in enumerate(by_value.values()):
+                    bitsets[row] = _packed(mask)
+                self._facets[key] = (list(by_value), bitsets)
+        return self._facets
+
+    @staticmethod
+    def _value_flags(column):
+        values, inverse = np.unique(column, return_inverse=True)
+        return {value.item(): inverse == i for i, value in enumerate(values)}
+
+    def _facet_bitset(self, key, selected):
+        # The cases passing a facet filter: the union of the bitsets of the selected values
+        values, bitsets = self.facets()[key]
+        if key == "selected_categories":
+            selected = [category_code(option) for option in selected] + [""]
+        rows = [values.index(value) for value in selected if value in values]
+        bitset = np.bitwise_or.reduce(bitsets[rows], axis=0) if rows else np.zeros(bitsets.shape[1], dtype=np.uint64)
+        if key == "selected_outcomes":
+            # Outcomes the sidebar does not offer have no bitset
+            for outcome in selected:
+                if outcome not in values:
+                    bitset |= _packed(self._outcome_mask(outcome))
+        return bitset
+
+    def facet_counts(self, filters, candidates=None):
+        """Count, for every value of every facet, the cases that would pass with it selected.
+
+        A value's count is the number of cases (among ``candidates``, a
+        boolean case mask, if given) that have the value and pass every
+        active filter but the facet's own, so picking it never leads to an
+        empty search. Returns ``{filter key: {value: count}}``; categories are
+        counted by code.
+        """
+        facets = self.facets()
+        others = self.mask({key: value for key, value in filters.items() if key not in FACET_KEYS})
+        if candidates is not None:
+            others &= candidates
+        base = _packed(others)
+        selections = {key: self._facet_bitset(key, filters[key]) for key in FACET_KEYS if filters.get(key)}
+
+        counts = {}
+        for key, (values, bitsets) in facets.items():
+            passing = base
+            for other, bitset in selections.items():
+                if other != key:
+                    passing = passing & bitset
+            value_counts = np.bitwise_count(bitsets & passing).sum(axis=1)
+            counts[key] = {value: int(count) for value, count in zip(values, value_counts) if value != ""}
+        return counts
+
+    def mask(self, filters):
+        """Return a boolean array marking the cases that pass every active filter."""
+        mask = np.ones(self.num_cases, dtype=bool)
+
+        if filters.get("selected_sports"):
+            mask &= np.isin(self.sports, list(filters["selected_sports"]))
+
+        if filters.get("selected_years"):
+            mask &= np.isin(self.years, list(filters["selected_years"]))
+
+        if filters.get("start_date"):
+            mask &= self.dates >= np.datetime64(filters["start_date"], "D")
+        if filters.get("end_date"):
+            mask &= self.dates <= np.datetime64(filters["end_date"], "D")
+
+        if filters.get("selected_proc"):
+            mask &= np.isin(self.types, list(filters["selected_proc"]))
+
+        if filters.get("selected_outcomes"):
+            outcome_mask = np.zeros(self.num_cases, dtype=bool)
+            for outcome in filters["selected_outcomes"]:
+                outcome_mask |= self._outcome_mask(outcome)
+            mask &= outcome_mask
+
+        for key, seat in ARBITRATOR_FILTERS.items():
+            if filters.get(key):
+                mask &= self._arbitrator_mask(filters[key], seat)
+
+        # Cases whose id has no category code are not filtered out
+        if filters.get("selected_categories"):
+            codes = [category_code(cat) for cat in filters["selected_categories"]]
+            mask &= np.isin(self.categories, codes) | (self.categories == "")
+
+        if filters.get("selected_matters"):
+            matter_mask = np.zeros(self.num_cases, dtype=bool)
+            for matter in filters["selected_matters"]:
+                if matter in self.matters:
+                    matter_mask |= self.matters[matter]
+            mask &= matter_mask
+
+        return mask
@@ -0,0 +1,62 @@
+import pandas as pd
+
+from corpus_store import METADATA_FIELDS
+from search_index import StringColumn
+
+# Keywords of a case are packed as one string, joined by this (unprintable) separator
+KEYWORD_SEPARATOR = "\x1f"
+
+
+def _text(value):
+    return None if value is None or (not isinstance(value, str) and pd.isna(value)) else value
+
+
+class CaseTable:
+    """Decision metadata packed into one StringColumn per field.
+
+    Holding a large corpus this way takes a few arrays instead of a
+    DataFrame with a Python object per field of every case; search results
+    decode the fields of a case, into a plain dict, only when it is shown.
+    """
+
+    __slots__ = ("fields", "nulls", "num_cases")
+
+    def __init__(self, metadata):
+        self.num_cases = len(metadata)
+        self.fields = {}
+        self.nulls = {}     # field -> rows where the value is missing, for the fields that have any
+        for field in METADATA_FIELDS:
+            if field == "keywords":
+                values = [KEYWORD_SEPARATOR.join(keywords or []) for keywords in metadata[field]]
+            else:
+                values = [_text(value) for value in metadata[field]]
+                missing = {row for row, value in enumerate(values) if value is None}
+                if missing:
+                    self.nulls[field] = missing
+            self.fields[field] = StringColumn.pack(values)
+
+    def __len__(self):
+        return self.num_cases
+
+    def extended(self, metadata):
+        """Return a new table with the cases of ``metadata`` (the next rows) after these."""
+        tail = CaseTable(metadata)
+        combined = CaseTable.__new__(CaseTable)
+        combined.num_cases = self.num_cases + tail.num_cases
+        combined.fields = {field: self.fields[field].concat(tail.fields[field]) for field in METADATA_FIELDS}
+        combined.nulls = {
+            field: self.nulls.get(field, set()) | {row + self.num_cases for row in tail.nulls.get(field, ())}
+            for field in set(self.nulls) | set(tail.nulls)
+        }
+        return combined
+
+    def record(self, row):
+        """The metadata of case ``row`` as a dict keyed by METADATA_FIELDS."""
+        record = {}
+        for field, column in self.fields.items():
+            if field == "keywords":
+                packed = column[row]
+                record[field] = packed.split(KEYWORD_SEPARATOR) if packed else []
+            else:
+                record[field] = None if row in self.nulls.get(field, ()) else column[row]
+        return record
@@ -0,0 +1,262 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from search_index import split_paragraphs
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_STORE_PATH = os.path.join(DATA_DIR, "caselens.sqlite")
+SAMPLE_DECISIONS_PATH = os.path.join(DATA_DIR, "sample_decisions.json")
+
+# Metadata fields kept for every decision; the text lives apart, as paragraphs
+METADATA_FIELDS = ["id", "title", "date", "type", "sport", "claimant", "respondent", "panel", "decision", "keywords"]
+
+# Upper bound on keys looked up by a single SQL statement
+LOOKUP_BATCH_SIZE = 400
+
+
+def decision_paragraphs(decision):
+    """Return a decision's paragraphs, segmenting its full text if needed."""
+    if decision.get("paragraphs") is not None:
+        return list(decision["paragraphs"])
+    return split_paragraphs(decision.get("full_text", ""))
+
+
+class CorpusStore:
+    """Storage for the decision corpus, with metadata and paragraph text kept apart.
+
+    Cases are addressed by their row number (0, 1, 2, ... in insertion order)
+    and paragraphs by ``(row, position)``. Search only ever loads metadata;
+    paragraph text is fetched on demand for the passages being shown.
+    The generation number increases on every write, so readers can tell
+    when their in-memory view is stale.
+    """
+
+    # Directory where the search index for this store is persisted, if any
+    index_dir = None
+
+    # Set in processes that only read the persisted index, while another one writes it
+    index_read_only = False
+
+    def generation(self):
+        raise NotImplementedError
+
+    def num_cases(self):
+        raise NotImplementedError
+
+    def load_metadata(self, start_row=0):
+        """Return the metadata of cases ``start_row`` onwards as a DataFrame."""
+        raise NotImplementedError
+
+    def iter_case_paragraphs(self, start_row=0):
+        """Yield ``(row, paragraphs)`` for cases ``start_row`` onwards, in row order."""
+        raise NotImplementedError
+
+    def get_paragraphs(self, keys):
+        """Return ``{(row, position): text}`` for the requested paragraphs."""
+        raise NotImplementedError
+
+    def existing_ids(self, case_ids):
+        """Return the subset of ``case_ids`` already in the store."""
+        raise NotImplementedError
+
+    def add_decisions(self, decisions):
+        """Append decisions (dicts with metadata and ``full_text`` or ``paragraphs``).
+
+        Returns the rows assigned to the new cases.
+        """
+        raise NotImplementedError
+
+
+class InMemoryCorpusStore(CorpusStore):
+    """Corpus store held entirely in process memory (sample data, tests, benchmarks)."""
+
+    def __init__(self, decisions=()):
+        self._metadata = []
+        self._paragraphs = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        if decisions:
+            self.add_decisions(decisions)
+
+    def generation(self):
+        return self._generation
+
+    def num_cases(self):
+        return len(self._metadata)
+
+    def load_metadata(self, start_row=0):
+        return pd.DataFrame(self._metadata[start_row:], columns=METADATA_FIELDS,
+                            index=range(start_row, len(self._metadata)))
+
+    def iter_case_paragraphs(self, start_row=0):
+        for row in range(start_row, len(self._paragraphs)):
+            yield row, self._paragraphs[row]
+
+    def get_paragraphs(self, keys):
+        return {(row, pos): self._paragraphs[row][pos] for row, pos in keys}
+
+    def existing_ids(self, case_ids):
+        known = {metadata["id"] for metadata in self._metadata}
+        return {case_id for case_id in case_ids if case_id in known}
+
+    def add_decisions(self, decisions):
+        with self._lock:
+            start = len(self._metadata)
+            for decision in decisions:
+                self._metadata.append({field: decision.get(field) for field in METADATA_FIELDS})
+                self._paragraphs.append(decision_paragraphs(decision))
+            self._generation += 1
+            return list(range(start, len(self._metadata)))
+
+
+class SQLiteCorpusStore(CorpusStore):
+    """Corpus store backed by a single SQLite file.
+
+    Decision metadata and paragraphs live in separate tables, so loading
+    metadata never reads any decision text. Each thread gets its own
+    connection, as Streamlit serves sessions from several threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_dir = path + ".index"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS decisions (
+                    row INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    title TEXT, date TEXT, type TEXT, sport TEXT,
+                    claimant TEXT, respondent TEXT, panel TEXT, decision TEXT,
+                    keywords TEXT
+                );
+                CREATE TABLE IF NOT EXISTS paragraphs (
+                    case_row INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (case_row, position)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def generation(self):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0])
+
+    def num_cases(self):
+        return self._connect().execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def load_metadata(self, start_row=0):
+        columns = ", ".join(METADATA_FIELDS)
+        metadata = pd.read_sql_query(
+            f"SELECT row, {columns} FROM decisions WHERE row >= ? ORDER BY row",
+            self._connect(), params=(start_row,), index_col="row",
+        )
+        metadata.index.name = None
+        metadata["keywords"] = metadata["keywords"].map(json.loads)
+        return metadata
+
+    def iter_case_paragraphs(self, start_row=0):
+        end_row = self.num_cases()
+        cursor = self._connect().execute(
+            "SELECT case_row, text FROM paragraphs WHERE case_row >= ? ORDER BY case_row, position",
+            (start_row,),
+        )
+        groups = itertools.groupby(cursor, key=lambda r: r[0])
+        current = next(groups, None)
+        # Cases without paragraphs still get an (empty) entry, to keep rows aligned
+        for row in range(start_row, end_row):
+            if current is not None and current[0] == row:
+                yield row, [text for _, text in current[1]]
+                current = next(groups, None)
+            else:
+                yield row, []
+
+    def get_paragraphs(self, keys):
+        keys = list(keys)
+        texts = {}
+        conn = self._connect()
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            values = ", ".join(["(?, ?)"] * len(batch))
+            params = [int(v) for key in batch for v in key]
+            # Joined rather than matched with IN, which SQLite answers by scanning the whole table
+            for case_row, position, text in conn.execute(
+                f"WITH wanted (case_row, position) AS (VALUES {values}) "
+                "SELECT case_row, position, text FROM wanted JOIN paragraphs USING (case_row, position)",
+                params,
+            ):
+                texts[(case_row, position)] = text
+        return texts
+
+    def existing_ids(self, case_ids):
+        case_ids = list(case_ids)
+        found = set()
+        for start in range(0, len(case_ids), LOOKUP_BATCH_SIZE):
+            batch = case_ids[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ", ".join(["?"] * len(batch))
+            found.update(row[0] for row in self._connect().execute(
+                f"SELECT id FROM decisions WHERE id IN ({placeholders})", batch))
+        return found
+
+    def add_decisions(self, decisions):
+        conn = self._connect()
+        rows = []
+        with conn:
+            next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM decisions").fetchone()[0]
+            for decision in decisions:
+                conn.execute(
+                    f"INSERT INTO decisions (row, {', '.join(METADATA_FIELDS)}) VALUES (?{', ?' * len(METADATA_FIELDS)})",
+                    [next_row] + [
+                        json.dumps(decision.get(field) or []) if field == "keywords" else decision.get(field)
+                        for field in METADATA_FIELDS
+                    ],
+                )
+                conn.executemany(
+                    "INSERT INTO paragraphs (case_row, position, text) VALUES (?, ?, ?)",
+                    [(next_row, pos, para) for pos, para in enumerate(decision_paragraphs(decision))],
+                )
+                rows.append(next_row)
+                next_row += 1
+            conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+        return rows
+
+
+def load_sample_decisions(path=SAMPLE_DECISIONS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_corpus_store(location=None):
+    """Open the corpus store at ``location`` (default: $CASELENS_CORPUS or data/caselens.sqlite).
+
+    ``.json`` files are loaded into an in-memory store; anything else is
+    treated as a SQLite database, created and seeded with the sample
+    decisions if it does not exist yet.
+    """
+    location = location or os.environ.get("CASELENS_CORPUS") or DEFAULT_STORE_PATH
+    if location.endswith(".json"):
+        return InMemoryCorpusStore(load_sample_decisions(location))
+
+    is_new = not os.path.exists(location)
+    store = SQLiteCorpusStore(location)
+    if is_new:
+        store.add_decisions(load_sample_decisions())
+    return store
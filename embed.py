@@ -0,0 +1,50 @@
+"""Compute paragraph embeddings for semantic search and build their ANN index.
+
+Usage:
+    python embed.py [--store PATH] [--model lsa|sentence-transformers:NAME] [--rebuild]
+
+Every paragraph in the store is embedded with a CPU-only local model and
+the vectors are saved, int8-quantized and clustered into an IVF index,
+next to the store's search index (<store>.index/vectors). The default
+model, "lsa", is fitted on a sample of the corpus and needs only NumPy;
+"sentence-transformers:all-MiniLM-L6-v2" (or any other local
+sentence-transformers model) needs the optional sentence-transformers
+package.
+
+This is a one-off step: once embeddings exist, ingest.py and
+bulk_ingest.py embed newly added decisions, and running app processes
+enable the "Semantic" search mode on their next rerun. Naming a different
+model than the existing embeddings use, or ``--rebuild``, re-embeds
+everything.
+"""
+import argparse
+import time
+
+from corpus_store import open_corpus_store
+from vector_index import VectorIndex
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed the corpus paragraphs for semantic search.")
+    parser.add_argument("--store", help="corpus store path (default: $CASELENS_CORPUS or data/caselens.sqlite)")
+    parser.add_argument("--model", default="lsa", help="'lsa' (default) or 'sentence-transformers:NAME'")
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every paragraph")
+    args = parser.parse_args(argv)
+
+    store = open_corpus_store(args.store)
+    if store.index_dir is None:
+        parser.error("the corpus store is read-only (in-memory); point --store at a SQLite file")
+
+    started = time.perf_counter()
+    try:
+        vectors = VectorIndex.for_store(store, args.model, rebuild=args.rebuild)
+    except (RuntimeError, ValueError) as exc:
+        parser.error(str(exc))
+    elapsed = time.perf_counter() - started
+    print(f"{vectors.num_docs} paragraphs of {vectors.num_cases} decisions embedded with "
+          f"{vectors.encoder.model} ({vectors.encoder.dim} dimensions, "
+          f"{len(vectors.centroids)} lists) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "relevance_taxonomy.json")
+
+# Query explanations remembered per distinct list of query terms
+QUERY_EXPLANATION_CACHE_SIZE = 1024
+
+# Passage topic codes are stored per paragraph in the index; 0 means "none"
+NO_PASSAGE_TOPIC = 0
+PASSAGE_TOPIC_DTYPE = np.uint8
+
+
+class Automaton:
+    """Aho-Corasick automaton: finds every occurrence of a set of patterns in one pass over a text.
+
+    Patterns are identified by their position in the list given to the
+    constructor. States are dicts of transitions; the failure links are
+    folded into them once, at construction, so matching is a single dict
+    lookup per character.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]
+        outputs = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(pattern_id)
+
+        # Breadth-first, so the failure target of a state is complete before the state itself
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(char, 0) if state else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+
+        # Complete the transitions: a missing one follows the failure link
+        self._delta = [dict(goto[0])]
+        self._delta.extend({} for _ in range(len(goto) - 1))
+        for state in queue:
+            self._delta[state] = {**self._delta[fail[state]], **goto[state]}
+        self._outputs = [tuple(ids) for ids in outputs]
+
+    def matches(self, text):
+        """The ids of the patterns occurring in ``text``, as a set."""
+        delta, outputs = self._delta, self._outputs
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class Taxonomy:
+    """The legal topics and the explanations shown for the passages of a search.
+
+    A passage is explained by the first topic (in taxonomy order) the query
+    names: the whole query, then a topic contained in it, then a topic
+    containing one of the query words. When the query names no topic, the
+    passage's own topic is used: the first passage topic one of whose
+    keywords the paragraph contains, matched once per paragraph when it is
+    indexed (see passage_topic). Otherwise a generic explanation names the
+    query terms.
+    """
+
+    def __init__(self, topics, passage_topics, fallback):
+        self.topics = [(topic["topic"].lower(), topic["explanation"]) for topic in topics]
+        self.passage_topics = [(list(topic["keywords"]), topic["explanation"]) for topic in passage_topics]
+        self.fallback = fallback
+        if len(self.passage_topics) >= np.iinfo(PASSAGE_TOPIC_DTYPE).max:
+            raise ValueError("Too many passage topics in the taxonomy")
+
+        self._topic_ids = {topic: topic_id for topic_id, (topic, _) in reversed(list(enumerate(self.topics)))}
+        self._topic_matcher = Automaton([topic for topic, _ in self.topics])
+        # Query word -> first topic equal to it or having it as a word
+        self._word_topics = {}
+        for topic_id, (topic, _) in enumerate(self.topics):
+            for word in [topic] + topic.split():
+                self._word_topics.setdefault(word, topic_id)
+
+        keywords = [(keyword.lower(), code) for code, (words, _) in enumerate(self.passage_topics, start=1)
+                    for keyword in words]
+        self._keyword_codes = [code for _, code in keywords]
+        self._passage_matcher = Automaton([keyword for keyword, _ in keywords])
+        self.passage_fingerprint = hashlib.sha1(json.dumps(keywords).encode("utf-8")).hexdigest()
+        self.query_explanation = functools.lru_cache(maxsize=QUERY_EXPLANATION_CACHE_SIZE)(self._query_explanation)
+
+    @classmethod
+    def load(cls, path=TAXONOMY_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["topics"], data["passage_topics"], data["fallback"])
+
+    def _query_explanation(self, query_terms):
+        full_query = " ".join(query_terms).lower()
+        if full_query in self._topic_ids:
+            return self.topics[self._topic_ids[full_query]][1]
+        contained = self._topic_matcher.matches(full_query)
+        if contained:
+            return self.topics[min(contained)][1]
+        for term in query_terms:
+            topic_id = self._word_topics.get(term.lower())
+            if topic_id is not None:
+                return self.topics[topic_id][1]
+        return None
+
+    def passage_topic(self, text):
+        """Code of the passage topic of a paragraph (NO_PASSAGE_TOPIC if none)."""
+        found = self._passage_matcher.matches(text.lower())
+        return min((self._keyword_codes[keyword_id] for keyword_id in found), default=NO_PASSAGE_TOPIC)
+
+    def explain(self, query_terms, passage_topic):
+        """The explanation of a paragraph with code ``passage_topic`` for a query."""
+        explanation = self.query_explanation(tuple(query_terms))
+        if explanation is not None:
+            return explanation
+        if passage_topic != NO_PASSAGE_TOPIC:
+            return self.passage_topics[passage_topic - 1][1]
+        return self.fallback.format(terms=", ".join(f"'{term}'" for term in query_terms))
+
+
+@functools.lru_cache(maxsize=None)
+def load_taxonomy(path=TAXONOMY_PATH):
+    """The taxonomy at ``path``, loaded and compiled once per process."""
+    return Taxonomy.load(path)
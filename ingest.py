@@ -0,0 +1,149 @@
+"""Append new CAS decisions to the corpus store and index them incrementally.
+
+Usage:
+    python ingest.py DIRECTORY [--store PATH] [--rebuild]
+
+DIRECTORY is scanned for:
+- ``*.json`` files holding one decision object or a list of them, with the
+  same fields as data/sample_decisions.json (``full_text`` or a list of
+  ``paragraphs``);
+- ``*.txt`` files starting with ``Field: value`` header lines (id, title,
+  date, type, sport, claimant, respondent, panel, decision, and keywords
+  as a comma-separated list), then a blank line, then the full text.
+
+Dates are stored as YYYY-MM-DD ("18 October 2024" is converted).
+Decisions without a readable date, or whose id is already in the store,
+are skipped. The new decisions are written to the store, which bumps its
+generation, and indexed into a new index segment; existing segments are
+left untouched. Running app processes notice the new generation on their
+next rerun and load only the new segment. ``--rebuild`` instead
+re-indexes the whole store into a single segment, which also compacts
+many small segments into one. If the store has paragraph embeddings for
+semantic search (embed.py), the new decisions are embedded as well.
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from corpus_store import METADATA_FIELDS, open_corpus_store
+from search_index import ParagraphIndex
+from vector_index import VECTOR_SUBDIR, VectorIndex
+
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+LONG_DATE = re.compile(
+    r"\b(\d{1,2})\s+(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})\b"
+)
+
+
+def parse_date(text):
+    """The first date in ``text`` ("2024-10-18" or "18 October 2024") as YYYY-MM-DD, or None."""
+    for pattern, date_format in ((ISO_DATE, "%Y %m %d"), (LONG_DATE, "%d %B %Y")):
+        for match in pattern.finditer(text):
+            try:
+                return datetime.datetime.strptime(" ".join(match.groups()), date_format).date().isoformat()
+            except ValueError:  # not a real date, such as 2024-02-30
+                continue
+    return None
+
+
+def parse_text_decision(text):
+    """Parse a ``Field: value`` header block followed by the decision's full text."""
+    header, _, body = text.partition("\n\n")
+    decision = {}
+    for line in header.splitlines():
+        field, sep, value = line.partition(":")
+        field = field.strip().lower()
+        if sep and field in METADATA_FIELDS:
+            decision[field] = value.strip()
+    if "keywords" in decision:
+        decision["keywords"] = [kw.strip() for kw in decision["keywords"].split(",") if kw.strip()]
+    decision["full_text"] = body
+    return decision
+
+
+def read_decisions(directory):
+    """Yield ``(path, decision)`` for every decision file in ``directory``, in name order."""
+    for path in sorted(glob.glob(os.path.join(directory, "*.json")) + glob.glob(os.path.join(directory, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                data = json.load(f)
+                for decision in data if isinstance(data, list) else [data]:
+                    yield path, decision
+            else:
+                yield path, parse_text_decision(f.read())
+
+
+def ingest_decisions(store, decisions, rebuild=False, update_index=True):
+    """Add new decisions to ``store`` and bring its persisted index up to date.
+
+    With ``update_index=False`` only the store is written; the next index
+    refresh (by this tool or by a running app) indexes the new rows.
+    Returns the number of decisions added (duplicates of stored ids are skipped).
+    """
+    decisions = [d for d in decisions if d.get("id")]
+    known = store.existing_ids(d["id"] for d in decisions)
+    new, seen = [], set(known)
+    for decision in decisions:
+        if decision["id"] not in seen:
+            seen.add(decision["id"])
+            new.append(decision)
+
+    if new:
+        store.add_decisions(new)
+    if store.index_dir and update_index:
+        refresh_index(store, rebuild)
+    return len(new)
+
+
+def refresh_index(store, rebuild=False):
+    """Index the store rows the persisted index does not cover yet (or everything, if ``rebuild``).
+
+    If paragraph embeddings exist (see embed.py), the new rows are embedded too.
+    """
+    if rebuild:
+        index = ParagraphIndex(generation=store.generation()).refreshed(store)
+    else:
+        index = ParagraphIndex.for_store(store)
+    vectors = VectorIndex.load(os.path.join(store.index_dir, VECTOR_SUBDIR))
+    if vectors is not None:
+        vectors.refreshed(store)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add CAS decisions to the corpus store and index.")
+    parser.add_argument("directory", help="directory of decision .json/.txt files")
+    parser.add_argument("--store", help="corpus store path (default: $CASELENS_CORPUS or data/caselens.sqlite)")
+    parser.add_argument("--rebuild", action="store_true", help="re-index the whole store into one segment")
+    args = parser.parse_args(argv)
+
+    store = open_corpus_store(args.store)
+    if store.index_dir is None:
+        parser.error("the corpus store is read-only (in-memory); point --store at a SQLite file")
+    decisions = []
+    for path, decision in read_decisions(args.directory):
+        if not decision.get("id"):
+            print(f"Skipping a decision without an id in {path}", file=sys.stderr)
+            continue
+        # The store keeps dates as YYYY-MM-DD, which is what the date filters parse
+        date = parse_date(str(decision.get("date") or ""))
+        if date is None:
+            print(f"Skipping {decision['id']} in {path}: no readable date", file=sys.stderr)
+            continue
+        decision["date"] = date
+        decisions.append(decision)
+
+    started = time.perf_counter()
+    added = ingest_decisions(store, decisions, rebuild=args.rebuild)
+    elapsed = time.perf_counter() - started
+    print(f"Added {added} of {len(decisions)} decisions in {elapsed:.2f}s "
+          f"(store generation {store.generation()}, {store.num_cases()} decisions)")
+
+
+if __name__ == "__main__":
+    main()
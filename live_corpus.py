@@ -0,0 +1,89 @@
+import os
+import threading
+
+from case_filters import CaseColumns
+from case_table import CaseTable
+from search_index import ParagraphIndex
+from vector_index import VECTOR_SUBDIR, VectorIndex
+
+
+class CorpusSnapshot:
+    """Decision metadata (a CaseTable), search indexes and filter columns as of one store generation.
+
+    Snapshots are never modified: picking up new decisions produces a new
+    snapshot that shares the old index segments and extends the metadata and
+    filter columns with the new rows only, so searches already running on
+    the old snapshot are unaffected.
+
+    ``vectors`` is the store's VectorIndex for semantic search, or None when
+    no embeddings have been computed (see embed.py).
+    """
+
+    def __init__(self, store, generation, cases, index, columns, vectors=None):
+        self.store = store
+        self.generation = generation
+        self.cases = cases
+        self.index = index
+        self.columns = columns
+        self.vectors = vectors
+
+    @staticmethod
+    def _load_vectors(store, previous=None):
+        # Embeddings are computed offline; the app only picks up what embed.py/ingest.py persisted
+        if store.index_dir is None:
+            return None
+        encoder = previous.encoder if previous is not None else None
+        return VectorIndex.load(os.path.join(store.index_dir, VECTOR_SUBDIR), encoder=encoder)
+
+    @classmethod
+    def load(cls, store):
+        generation = store.generation()
+        index = ParagraphIndex.for_store(store)
+        metadata = store.load_metadata().iloc[:index.num_cases]
+        return cls(store, generation, CaseTable(metadata), index, CaseColumns(metadata), cls._load_vectors(store))
+
+    def _vectors_changed(self):
+        if self.store.index_dir is None:
+            return False
+        name = VectorIndex.current_name(os.path.join(self.store.index_dir, VECTOR_SUBDIR))
+        return name != (self.vectors.name if self.vectors is not None else None)
+
+    def is_stale(self):
+        """Whether the store has new decisions, or new embeddings, this snapshot doesn't have."""
+        return self.store.generation() != self.generation or self._vectors_changed()
+
+    def refreshed(self):
+        """Return a snapshot of the store's current generation (``self`` if unchanged)."""
+        generation = self.store.generation()
+        if generation == self.generation:
+            if not self._vectors_changed():
+                return self
+            return CorpusSnapshot(self.store, generation, self.cases, self.index, self.columns,
+                                  self._load_vectors(self.store, self.vectors))
+        index = self.index.refreshed(self.store, generation)
+        # The index is read first, so the store has at least as many rows as it covers
+        new_metadata = self.store.load_metadata(len(self.cases)).iloc[:index.num_cases - len(self.cases)]
+        vectors = self._load_vectors(self.store, self.vectors)
+        if len(new_metadata) == 0:
+            return CorpusSnapshot(self.store, generation, self.cases, index, self.columns, vectors)
+        cases = self.cases.extended(new_metadata)
+        columns = self.columns.extended(new_metadata)
+        return CorpusSnapshot(self.store, generation, cases, index, columns, vectors)
+
+
+class LiveCorpus:
+    """Keeps the current CorpusSnapshot of a store, picking up new generations as they appear."""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._snapshot = CorpusSnapshot.load(store)
+
+    def current(self):
+        """Return the up-to-date snapshot; only the first caller after an ingestion does the work."""
+        snapshot = self._snapshot
+        if snapshot.is_stale():
+            with self._lock:
+                self._snapshot = self._snapshot.refreshed()
+                snapshot = self._snapshot
+        return snapshot
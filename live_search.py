@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+
+from search_engine import HIT_DTYPE, MAX_RESULTS, pack_hits, rank_cases
+from search_index import tokenize
+
+# A last word shorter than this is not searched yet, and a last word is expanded to (at most)
+# this many indexed terms, the most frequent first
+LIVE_MIN_PREFIX = 2
+LIVE_PREFIX_EXPANSIONS = 20
+
+# Keystrokes closer together than this are searched once, when the typing pauses
+LIVE_DEBOUNCE_MS = 150
+
+
+def query_groups(query):
+    """The term groups of a partly typed query, as a tuple of ``(kind, text)`` pairs.
+
+    Every complete word is a ``("term", word)`` group. The last word is
+    still being typed unless the query ends with a space: it is a
+    ``("prefix", word)`` group, left out while shorter than LIVE_MIN_PREFIX.
+    """
+    words = tokenize(query)
+    groups = [("term", word) for word in words]
+    if words and not query[-1].isspace():
+        groups.pop()
+        if len(words[-1]) >= LIVE_MIN_PREFIX:
+            groups.append(("prefix", words[-1]))
+    return tuple(dict.fromkeys(groups))
+
+
+def _group_terms(index, group):
+    kind, text = group
+    return (text,) if kind == "term" else tuple(index.expand_prefix(text, LIVE_PREFIX_EXPANSIONS))
+
+
+def _typed_before(groups):
+    # The groups of the keystroke before, if it only typed (part of) the last word further
+    kind, text = groups[-1]
+    before = text if kind == "term" else text[:-1]
+    return groups[:-1] + (("prefix", before),) if len(before) >= LIVE_MIN_PREFIX else None
+
+
+def live_candidates(corpus, groups, cache):
+    """The decisions matching every group of a query: ``(case mask, terms of each group)``.
+
+    A decision matches a group if one of its paragraphs contains the term,
+    or one of the expansions of the prefix. The candidates of the groups
+    are kept in ``cache`` (a QueryCache), so a keystroke that extends the
+    query only intersects the candidates of the one before with the
+    decisions of its last group: those of the query without its last
+    group, or of the keystroke that typed the start of the last word when
+    its expansions hold all of this one's.
+    """
+    entry = cache.get(groups)
+    if entry is not None:
+        return entry
+    if not groups:
+        return np.ones(len(corpus.cases), dtype=bool), ()
+    base, base_terms = live_candidates(corpus, groups[:-1], cache)
+    terms = _group_terms(corpus.index, groups[-1])
+    before = _typed_before(groups)
+    if before is not None:
+        previous = cache.get(before)
+        if previous is not None and set(terms) <= set(previous[1][-1]):
+            base = previous[0]
+
+    matching = np.zeros(len(corpus.cases), dtype=bool)
+    for term in terms:
+        matching[corpus.index.term_cases(term)] = True
+    entry = (base & matching, base_terms + (terms,))
+    cache.put(groups, entry)
+    return entry
+
+
+def find_live(corpus, groups, filters, cache, top_k=MAX_RESULTS, timings=None, counters=None):
+    """Rank the decisions matching every group of a partly typed query; returns its hits (see find_cases).
+
+    The paragraphs of the candidate decisions that pass ``filters`` are
+    scored with BM25 against the terms and prefix expansions of the query.
+    ``timings`` and ``counters`` are filled like find_cases fills them.
+    """
+    timings = {} if timings is None else timings
+    counters = {} if counters is None else counters
+    if not groups:
+        return np.empty(0, dtype=HIT_DTYPE)
+    started = time.perf_counter()
+    candidates, terms = live_candidates(corpus, groups, cache)
+    case_mask = candidates & corpus.columns.mask(filters)
+    timings["candidates"] = time.perf_counter() - started
+    counters["cases_scanned"] = int(np.count_nonzero(case_mask))
+
+    started = time.perf_counter()
+    para_ids, scores = corpus.index.score(" ".join(term for group in terms for term in group), case_mask)
+    timings["lexical"] = time.perf_counter() - started
+    counters["paragraphs_scored"] = len(para_ids)
+    if len(para_ids) == 0:
+        return np.empty(0, dtype=HIT_DTYPE)
+    return pack_hits(rank_cases(corpus, para_ids, scores, top_k))
@@ -0,0 +1,96 @@
+import datetime
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from query_language import is_structured
+
+
+def _canonical(value):
+    # Lists are membership filters, so their order and duplicates don't matter
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted({_canonical(v) for v in value}, key=repr)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+def filter_state_hash(filters):
+    """Return a stable hash of a filter state dict, independent of selection order."""
+    canonical = {key: _canonical(value) for key, value in filters.items()}
+    payload = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def make_query_key(query, filters, *extra):
+    """Build the cache key for a query: its normalized terms plus the filter state.
+
+    A structured query keeps its case, since its operators (AND, OR, NOT,
+    NEAR/n) are only operators in upper case.
+    """
+    terms = query.split() if is_structured(query) else query.lower().split()
+    return (tuple(terms), filter_state_hash(filters)) + extra
+
+
+class QueryCache:
+    """Thread-safe LRU cache of search results with a size limit and a TTL.
+
+    Entries older than ``ttl_seconds`` are treated as misses; once the cache
+    holds ``max_entries`` items, the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        return self._lookup(key, count_miss=True)
+
+    def peek(self, key):
+        """Like get, but a miss is not counted: for a check followed by a get when it misses."""
+        return self._lookup(key, count_miss=False)
+
+    def _lookup(self, key, count_miss):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += count_miss
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
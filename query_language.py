@@ -0,0 +1,248 @@
+import re
+
+import numpy as np
+
+from search_index import POSITION_STRIDE, term_positions, tokenize
+
+# Query tokens: quoted phrases, parentheses, NEAR/n, and anything else up to a space,
+# quote or parenthesis
+QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|NEAR/\d+|[^\s"()]+')
+OPERATORS = ("AND", "OR", "NOT")
+NEAR_OPERATOR = re.compile(r"NEAR/(\d+)$")
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+# Set operations on sorted, duplicate-free int64 arrays (what postings and keys are), by
+# binary search instead of the generic (sorting or hashing) NumPy set routines
+
+def _contains(haystack, needles):
+    if len(haystack) == 0:
+        return np.zeros(len(needles), dtype=bool)
+    idx = np.minimum(np.searchsorted(haystack, needles), len(haystack) - 1)
+    return haystack[idx] == needles
+
+
+def _intersect(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return a[_contains(b, a)]
+
+
+def _union(a, b):
+    merged = np.sort(np.concatenate([a, b]), kind="stable")
+    return _dedupe(merged)
+
+
+def _difference(a, b):
+    return a[~_contains(b, a)]
+
+
+def _dedupe(sorted_values):
+    if len(sorted_values) == 0:
+        return sorted_values
+    return sorted_values[np.r_[True, sorted_values[1:] != sorted_values[:-1]]]
+
+
+class Phrase:
+    """Consecutive terms (a single term is a one-word phrase)."""
+
+    def __init__(self, text):
+        self.words = tokenize(text)
+        self.pairs = term_positions(text)
+        if not self.pairs:
+            raise QuerySyntaxError(f"no searchable words in {text!r}")
+
+    def terms(self):
+        return list(self.words)
+
+    def keys(self, index):
+        """Keys (paragraph id * POSITION_STRIDE + position) of every occurrence of the phrase start."""
+        keys = None
+        for term, offset in self.pairs:
+            term_keys = index.term_keys(term) - offset
+            keys = term_keys if keys is None else _intersect(keys, term_keys)
+            if len(keys) == 0:
+                break
+        return keys
+
+    def docs(self, index):
+        return _dedupe(self.keys(index) // POSITION_STRIDE)
+
+
+class Near:
+    """Two phrases (or nested NEARs) at most ``distance`` positions apart, in either order."""
+
+    def __init__(self, left, right, distance):
+        self.left = left
+        self.right = right
+        self.distance = distance
+
+    def terms(self):
+        return self.left.terms() + self.right.terms()
+
+    def keys(self, index):
+        left, right = self.left.keys(index), self.right.keys(index)
+        if len(left) == 0 or len(right) == 0:
+            return np.empty(0, dtype=np.int64)
+        # The first right occurrence at or after left - distance must not be beyond left + distance;
+        # the stride keeps occurrences in different paragraphs far apart
+        first = np.searchsorted(right, left - self.distance)
+        found = first < len(right)
+        found[found] = right[first[found]] <= left[found] + self.distance
+        return left[found]
+
+    def docs(self, index):
+        return _dedupe(self.keys(index) // POSITION_STRIDE)
+
+
+class And:
+    def __init__(self, children):
+        self.children = children
+
+    def terms(self):
+        return [term for child in self.children if not isinstance(child, Not) for term in child.terms()]
+
+    def docs(self, index):
+        positive = [c for c in self.children if not isinstance(c, Not)]
+        negative = [c.child for c in self.children if isinstance(c, Not)]
+        if positive:
+            docs = positive[0].docs(index)
+            for child in positive[1:]:
+                docs = _intersect(docs, child.docs(index))
+        else:
+            docs = np.arange(index.num_docs, dtype=np.int64)
+        for child in negative:
+            docs = _difference(docs, child.docs(index))
+        return docs
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def terms(self):
+        return [term for child in self.children for term in child.terms()]
+
+    def docs(self, index):
+        docs = self.children[0].docs(index)
+        for child in self.children[1:]:
+            docs = _union(docs, child.docs(index))
+        return docs
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def terms(self):
+        return []
+
+    def docs(self, index):
+        return _difference(np.arange(index.num_docs, dtype=np.int64), self.child.docs(index))
+
+
+class _Parser:
+    """Recursive-descent parser; precedence from loosest to tightest: OR, AND (or adjacency), NOT, NEAR/n."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QuerySyntaxError(f"unexpected {self.peek()!r}")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_near()
+
+    def parse_near(self):
+        node = self.parse_primary()
+        while self.peek() is not None and NEAR_OPERATOR.match(self.peek()):
+            distance = int(NEAR_OPERATOR.match(self.take()).group(1))
+            right = self.parse_primary()
+            if not isinstance(node, (Phrase, Near)) or not isinstance(right, Phrase):
+                raise QuerySyntaxError("NEAR/n needs words or phrases on both sides")
+            node = Near(node, right, distance)
+        return node
+
+    def parse_primary(self):
+        token = self.take()
+        if token is None or token in OPERATORS or token == ")" or NEAR_OPERATOR.match(token):
+            raise QuerySyntaxError(f"expected a word, phrase or '(' but got {token!r}")
+        if token == "(":
+            node = self.parse_or()
+            if self.take() != ")":
+                raise QuerySyntaxError("missing ')'")
+            return node
+        return Phrase(token.strip('"'))
+
+
+class StructuredQuery:
+    """A parsed query-language query.
+
+    ``"just cause"`` matches the exact phrase; ``coach NEAR/5 dismissal``
+    matches the words (or phrases) at most 5 positions apart, in either
+    order; AND, OR, NOT and parentheses combine clauses, and clauses written
+    side by side must all match. Operators are upper-case, so "and"/"or"
+    in natural-language queries stay ordinary words.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def terms(self):
+        """The terms that must or may appear (NOT clauses excluded), for ranking and explanations."""
+        return list(dict.fromkeys(self.root.terms()))
+
+    def matches(self, index):
+        """Sorted global ids of the paragraphs matching the query."""
+        return self.root.docs(index)
+
+
+def is_structured(query):
+    """Whether the query uses the query language (quotes, parentheses or operators)."""
+    return any(token.startswith('"') or token in ("(", ")") or token in OPERATORS or NEAR_OPERATOR.match(token)
+               for token in QUERY_TOKEN.findall(query))
+
+
+def parse_query(query):
+    """Parse ``query``; returns a StructuredQuery, or None for a plain (unstructured) query.
+
+    Raises QuerySyntaxError for a malformed structured query.
+    """
+    if not is_structured(query):
+        return None
+    if query.count('"') % 2:
+        raise QuerySyntaxError("unbalanced quotes")
+    return StructuredQuery(_Parser(QUERY_TOKEN.findall(query)).parse())
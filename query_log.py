@@ -0,0 +1,52 @@
+import datetime
+import json
+import threading
+
+
+def _json_default(value):
+    # Dates in filter states
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class QueryLog:
+    """Append-only log of the queries searched, one JSON object per line.
+
+    Each entry has the query and everything needed to search it again
+    ("kind": "find" or "live", "query", "filters", "top_k", "mode",
+    "ranking"), when it was searched ("time", ISO 8601 UTC, and "ts", Unix
+    seconds), and how it went ("latency_ms", "hits", "cases",
+    "cache_hit", and "error" for a malformed query). replay.py replays a
+    log against a search backend.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, started, **entry):
+        """Append an entry for a query searched at ``started`` (Unix seconds)."""
+        when = datetime.datetime.fromtimestamp(started, datetime.timezone.utc)
+        line = json.dumps({"time": when.isoformat(timespec="milliseconds"), "ts": started, **entry},
+                          default=_json_default)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_query_log(path):
+    """The entries of a query log, in file order; a line cut short (by a crash) is skipped."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
@@ -0,0 +1,153 @@
+"""Replay a query log against the search path, for load testing and host sizing.
+
+Usage:
+    python replay.py LOG [--store PATH | --url URLS] [--concurrency N] [--speedup X] [--no-cache]
+                     [--limit N] [--output PATH]
+
+The queries of LOG (see query_log: the app writes one with
+$CASELENS_QUERY_LOG set, search_service.py with --query-log) are sent to a
+search backend at the pace they were logged, ``--speedup`` times faster
+(0: back to back), by up to ``--concurrency`` at once. The backend is a
+SearchService on the corpus store, in this process, or the search
+services at ``--url`` (comma-separated), which is what measures a host.
+
+A query's latency runs from the time it was due, so when the backend
+falls behind the schedule, the time queries wait for a free worker shows
+in the tail; its service time runs from when it was sent. Reported:
+throughput, p50/p95/p99/max latency and service time (overall and per
+kind of query), errors, and the latency logged originally, for
+comparison. With ``--output`` the report is also written as JSON.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmark import latency_stats
+from corpus_store import open_corpus_store
+from live_corpus import LiveCorpus
+from query_log import read_query_log
+from search_engine import MAX_RESULTS
+from search_service import QUERY_CACHE_SIZE, SearchClient, SearchService
+
+DEFAULT_CONCURRENCY = 4
+
+
+def _stats(seconds):
+    return dict(latency_stats(seconds), max_ms=float(np.max(seconds)) * 1000.0)
+
+
+def _run(backend, entry):
+    # Search one logged query like the app did
+    filters, top_k = entry.get("filters") or {}, entry.get("top_k", MAX_RESULTS)
+    if entry.get("kind") == "live":
+        return backend.find_live(entry["query"], filters, top_k)
+    return backend.find(entry["query"], filters, top_k, entry.get("mode", "keyword"), entry.get("ranking"))
+
+
+def replay_log(backend, entries, concurrency=DEFAULT_CONCURRENCY, speedup=1.0):
+    """Send the logged queries ``entries`` to ``backend`` on their schedule; returns the report (see above)."""
+    entries = sorted(entries, key=lambda entry: entry["ts"])
+    outcomes = [None] * len(entries)    # (kind, latency, service time, error type or None)
+
+    def run(i, due):
+        sent = time.perf_counter()
+        error = None
+        try:
+            _run(backend, entries[i])
+        except (ValueError, RuntimeError, OSError) as exc:
+            # Malformed queries, a semantic query without embeddings, or a failing service
+            error = type(exc).__name__
+        done = time.perf_counter()
+        outcomes[i] = (entries[i].get("kind", "find"), done - (sent if due is None else due), done - sent, error)
+
+    first_ts = entries[0]["ts"]
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as pool:
+        started = time.perf_counter()
+        if speedup > 0:
+            for i, entry in enumerate(entries):
+                due = started + (entry["ts"] - first_ts) / speedup
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(run, i, due))
+        else:
+            # Back to back: the latency of a query is its service time
+            futures = [pool.submit(run, i, None) for i in range(len(entries))]
+    seconds = time.perf_counter() - started
+    for future in futures:
+        future.result()
+
+    report = {
+        "queries": len(entries),
+        "concurrency": concurrency,
+        "speedup": speedup,
+        "seconds": seconds,
+        "throughput_qps": len(entries) / seconds,
+        "errors": {},
+        "latency": _stats([latency for _, latency, _, _ in outcomes]),
+        "service": _stats([service for _, _, service, _ in outcomes]),
+        "kinds": {},
+    }
+    for kind, _, _, error in outcomes:
+        if error is not None:
+            report["errors"][error] = report["errors"].get(error, 0) + 1
+    for kind in sorted({kind for kind, _, _, _ in outcomes}):
+        report["kinds"][kind] = _stats([latency for k, latency, _, _ in outcomes if k == kind])
+    logged = [entry["latency_ms"] / 1000.0 for entry in entries if "latency_ms" in entry]
+    if logged:
+        report["logged_latency"] = _stats(logged)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a query log against the search path.")
+    parser.add_argument("log", help="query log to replay (see query_log)")
+    backend_args = parser.add_mutually_exclusive_group()
+    backend_args.add_argument("--store", help="corpus store path (default: $CASELENS_CORPUS or data/caselens.sqlite)")
+    backend_args.add_argument("--url", help="search service URL(s), comma-separated, instead of an in-process search")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"queries in flight at most (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="replay the log this many times faster than it was recorded (0: back to back)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the result cache of the in-process search, so every query does the full work")
+    parser.add_argument("--limit", type=int, help="replay only the first N queries")
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    entries = read_query_log(args.log)[:args.limit]
+    if not entries:
+        parser.error(f"no queries in {args.log}")
+    if args.url:
+        backend = SearchClient(args.url)
+    else:
+        backend = SearchService(LiveCorpus(open_corpus_store(args.store)),
+                                cache_size=0 if args.no_cache else QUERY_CACHE_SIZE)
+    # Load the corpus (or reach the services) before the clock starts
+    backend.info()
+
+    report = replay_log(backend, entries, args.concurrency, args.speedup)
+    latency, service = report["latency"], report["service"]
+    print(f"{report['queries']} queries in {report['seconds']:.1f}s ({report['throughput_qps']:.1f} q/s, "
+          f"concurrency {args.concurrency}, speed-up {args.speedup:g}) | latency p50 {latency['p50_ms']:.1f} ms, "
+          f"p95 {latency['p95_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms, max {latency['max_ms']:.1f} ms | "
+          f"service p50 {service['p50_ms']:.1f} ms, p99 {service['p99_ms']:.1f} ms")
+    for kind, stats in report["kinds"].items():
+        print(f"  {kind}: {stats['count']} queries, p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+    if "logged_latency" in report:
+        logged = report["logged_latency"]
+        print(f"  as logged: p50 {logged['p50_ms']:.1f} ms, p99 {logged['p99_ms']:.1f} ms")
+    if report["errors"]:
+        print("  errors: " + ", ".join(f"{error} {count}" for error, count in report["errors"].items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
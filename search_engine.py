@@ -0,0 +1,357 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from explanations import load_taxonomy
+from query_language import parse_query
+from search_index import index_terms, tokenize, top_k_indices
+
+# Maximum number of decisions returned by a search
+MAX_RESULTS = 50
+
+# "keyword" ranks paragraphs with BM25; "semantic" by embedding similarity; "hybrid" fuses
+# both rankings ("semantic" and "hybrid" need corpus.vectors)
+SEARCH_MODES = ("keyword", "semantic", "hybrid")
+
+# Hybrid ranking: fusion method ("rrf" = reciprocal rank fusion, or "weighted" = min-max
+# normalized score fusion), the RRF rank constant, the lexical share of the fused score,
+# and the paragraphs each retriever contributes to the fusion
+FUSION_METHODS = ("rrf", "weighted")
+RRF_K = 60
+DEFAULT_LEXICAL_WEIGHT = 0.5
+HYBRID_CANDIDATES = 1000
+
+# Re-ranking: fused paragraphs re-scored on their text, and the share of embedding
+# similarity (vs. query term coverage) in the re-ranking score
+RERANK_DEPTH = 100
+RERANK_SIMILARITY_WEIGHT = 0.5
+
+# A search hit: one matched paragraph (position within its case) of a result case, with its
+# score. Hits arrays list the result cases best first, each case's hits adjacent and best first
+HIT_DTYPE = np.dtype([("case", np.int64), ("para", np.int32), ("score", np.float32)])
+
+# Both hybrid retrievers run at once; NumPy releases the GIL for most of their work
+_retriever_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retriever")
+
+
+def _timed(timings, stage, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    timings[stage] = time.perf_counter() - started
+    return result
+
+
+def fuse_rankings(rankings, method="rrf", weights=None, k=RRF_K):
+    """Merge ``(para_ids, scores)`` rankings into one, sorted by paragraph id.
+
+    With "rrf", a paragraph scores ``sum(weight / (k + rank))`` over the
+    rankings it appears in; with "weighted", the sum of its min-max
+    normalized scores times the ranking weights.
+    """
+    weights = weights or [1.0] * len(rankings)
+    para_ids, inverse = np.unique(np.concatenate([ids for ids, _ in rankings]), return_inverse=True)
+    fused = np.zeros(len(para_ids), dtype=np.float64)
+    offset = 0
+    for (ids, scores), weight in zip(rankings, weights):
+        positions = inverse[offset:offset + len(ids)]
+        offset += len(ids)
+        if len(ids) == 0:
+            continue
+        if method == "rrf":
+            ranks = np.empty(len(ids), dtype=np.float64)
+            ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(ids) + 1)
+            fused[positions] += weight / (k + ranks)
+        else:
+            low, high = float(scores.min()), float(scores.max())
+            normalized = (scores - low) / (high - low) if high > low else np.ones(len(ids))
+            fused[positions] += weight * normalized
+    return para_ids, fused.astype(np.float32)
+
+
+def lexical_score(index, query, structured=None, case_mask=None, para_range=None):
+    """BM25-rank paragraphs; a query-language query ranks only the paragraphs it matches.
+
+    ``structured`` is the StructuredQuery parsed from ``query`` (None for a
+    plain query, whose paragraphs need only contain one of its terms).
+    Phrases and NEAR/n are resolved on the positional postings first, so
+    BM25 only accumulates scores for the matching paragraphs. ``para_range``
+    limits the postings read (see ParagraphIndex.score).
+    """
+    if structured is None:
+        return index.score(query, case_mask, para_range=para_range)
+    matches = structured.matches(index)
+    if len(matches) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return index.score(" ".join(structured.terms()), case_mask, restrict=matches, para_range=para_range)
+
+
+def rerank(corpus, query, para_ids, scores, depth=RERANK_DEPTH):
+    """Re-score the ``depth`` best paragraphs on their text and move them to the top.
+
+    The text of all of them is fetched in one store lookup and embedded in
+    one batch at full precision; the new score blends that similarity with
+    the share of query terms the paragraph contains, which favours exact
+    matches such as "Article 337c".
+    """
+    top = top_k_indices(scores, depth)
+    if len(top) == 0:
+        return scores
+    rows, positions = corpus.index.locate(para_ids[top])
+    keys = list(zip(rows.tolist(), positions.tolist()))
+    texts = corpus.store.get_paragraphs(keys)
+    batch = [texts[key] for key in keys]
+
+    encoder = corpus.vectors.encoder
+    similarity = encoder.encode(batch) @ encoder.encode([query])[0]
+    terms = set(tokenize(query))
+    coverage = np.array([len(terms.intersection(index_terms(text))) / max(len(terms), 1) for text in batch])
+    new_scores = RERANK_SIMILARITY_WEIGHT * similarity + (1 - RERANK_SIMILARITY_WEIGHT) * coverage
+
+    reranked = scores.copy()
+    reranked[top] = float(scores.max()) + 1.0 + new_scores
+    return reranked
+
+
+def retrieve(corpus, query, case_mask, mode="keyword", fusion="rrf", lexical_weight=DEFAULT_LEXICAL_WEIGHT,
+             rerank_results=False, timings=None):
+    """Rank the paragraphs of the cases in ``case_mask``; returns ``(para_ids, scores)`` by paragraph id.
+
+    Query-language syntax (quotes, NEAR/n, AND/OR/NOT) applies to lexical
+    retrieval; the vector retriever gets the query's words. Raises
+    QuerySyntaxError for a malformed query. Stage durations (in seconds)
+    are recorded into ``timings`` if given.
+    """
+    timings = {} if timings is None else timings
+    if mode in ("semantic", "hybrid") and corpus.vectors is None:
+        raise ValueError(f"{mode} search needs paragraph embeddings (run embed.py)")
+    structured = parse_query(query)
+    text = " ".join(structured.terms()) if structured is not None else query
+
+    if mode == "semantic":
+        # Nearest paragraphs by meaning, from the approximate nearest-neighbour index
+        para_ids, scores = _timed(timings, "semantic", corpus.vectors.search, text, corpus.index, case_mask)
+    elif mode == "hybrid":
+        # Lexical and vector retrieval run concurrently, then their rankings are fused
+        lexical = _retriever_pool.submit(_timed, timings, "lexical", lexical_score,
+                                         corpus.index, query, structured, case_mask)
+        semantic = _retriever_pool.submit(_timed, timings, "semantic", corpus.vectors.search,
+                                          text, corpus.index, case_mask)
+        lexical_ids, lexical_scores = lexical.result()
+        best = np.sort(top_k_indices(lexical_scores, HYBRID_CANDIDATES))
+        rankings = [(lexical_ids[best], lexical_scores[best]), semantic.result()]
+        para_ids, scores = _timed(timings, "fusion", fuse_rankings, rankings, fusion,
+                                  [lexical_weight, 1.0 - lexical_weight])
+    else:
+        # BM25-score every paragraph of a candidate case containing a query term (or matching
+        # the query, for a query-language query)
+        para_ids, scores = _timed(timings, "lexical", lexical_score, corpus.index, query, structured, case_mask)
+
+    if rerank_results and corpus.vectors is not None and len(para_ids):
+        scores = _timed(timings, "rerank", rerank, corpus, text, para_ids, scores)
+    return para_ids, scores
+
+
+def search(corpus, query, filters, top_k=MAX_RESULTS, mode="keyword", fusion="rrf",
+           lexical_weight=DEFAULT_LEXICAL_WEIGHT, rerank_results=False, timings=None, counters=None):
+    """Search a CorpusSnapshot and return ``(results, chunks)``.
+
+    ``filters`` is a dict of filter values keyed like the app's session
+    state. ``mode`` is one of SEARCH_MODES; ``fusion`` and
+    ``lexical_weight`` tune the hybrid ranking, and ``rerank_results``
+    re-scores the best paragraphs on their text (see retrieve). If
+    ``timings`` is a dict, the duration of each stage is stored in it, in
+    seconds, and if ``counters`` is, the work done (see find_cases, plus
+    "chunks_emitted"). Raises QuerySyntaxError for a malformed
+    query-language query (see query_language).
+    """
+    timings = {} if timings is None else timings
+    counters = {} if counters is None else counters
+    top_cases = find_cases(corpus, query, filters, top_k, mode, fusion, lexical_weight, rerank_results, timings,
+                           counters)
+    if not top_cases:
+        return [], []
+    passages_started = time.perf_counter()
+    all_results, all_chunks = build_results(corpus, top_cases, explanation_terms(query))
+    timings["passages"] = time.perf_counter() - passages_started
+    counters["chunks_emitted"] = len(all_chunks)
+    
+    return all_results, all_chunks
+
+
+def find_cases(corpus, query, filters, top_k=MAX_RESULTS, mode="keyword", fusion="rrf",
+               lexical_weight=DEFAULT_LEXICAL_WEIGHT, rerank_results=False, timings=None, counters=None):
+    """The ranking half of search(): returns its top cases as rank_cases does, without any text.
+
+    ``counters`` (if given) gets the number of "cases_scanned" (passing the
+    filters) and of "paragraphs_scored".
+    """
+    timings = {} if timings is None else timings
+    counters = {} if counters is None else counters
+    
+    # Evaluate the filters once, as a mask over all cases, before any text scoring
+    case_mask = _timed(timings, "filters", corpus.columns.mask, filters)
+    counters["cases_scanned"] = int(np.count_nonzero(case_mask))
+    
+    para_ids, scores = retrieve(corpus, query, case_mask, mode, fusion, lexical_weight, rerank_results, timings)
+    counters["paragraphs_scored"] = len(para_ids)
+    if len(para_ids) == 0:
+        return []
+    return _timed(timings, "ranking", rank_cases, corpus, para_ids, scores, top_k)
+
+
+def candidate_cases(corpus, query):
+    """Boolean case mask of the decisions with a paragraph matching ``query`` (lexically), whatever the filters."""
+    para_ids, _ = lexical_score(corpus.index, query, parse_query(query))
+    mask = np.zeros(len(corpus.cases), dtype=bool)
+    mask[corpus.index.locate(para_ids)[0]] = True
+    return mask
+
+
+def pack_hits(top_cases):
+    """Pack ``(case row, matches)`` pairs (see rank_cases) into a HIT_DTYPE array."""
+    return np.array([(case_idx, para_idx, score) for case_idx, matches in top_cases for para_idx, score in matches],
+                    dtype=HIT_DTYPE)
+
+
+def unpack_hits(hits):
+    """The ``(case row, matches)`` pairs of a HIT_DTYPE array, best case first."""
+    top_cases = []
+    for case_idx, para_idx, score in hits.tolist():
+        if not top_cases or top_cases[-1][0] != case_idx:
+            top_cases.append((case_idx, []))
+        top_cases[-1][1].append((para_idx, score))
+    return top_cases
+
+
+def hit_case_starts(hits):
+    """Index of the first hit of each result case in a HIT_DTYPE array."""
+    cases = hits["case"]
+    return np.flatnonzero(np.r_[True, cases[1:] != cases[:-1]]) if len(hits) else np.empty(0, dtype=np.int64)
+
+
+def explanation_terms(query):
+    """The terms of a query for explanations (the words of a query-language query)."""
+    structured = parse_query(query)
+    return structured.terms() if structured is not None else query.lower().split()
+
+
+def rank_cases(corpus, para_ids, scores, top_k=MAX_RESULTS):
+    """Group ranked paragraphs by case; returns the ``top_k`` best ``(case row, matches)``, best first.
+
+    ``matches`` are the case's 3 best ``(paragraph position, score)`` pairs,
+    best first. Ties go to the earlier case (or paragraph), so ranking a
+    subset of the cases keeps their relative order.
+    """
+    # Paragraph ids are grouped by case, so each case is one contiguous run
+    para_cases, para_positions = corpus.index.locate(para_ids)
+    group_starts = np.flatnonzero(np.r_[True, para_cases[1:] != para_cases[:-1]])
+    group_ends = np.r_[group_starts[1:], len(para_ids)]
+    case_best = np.maximum.reduceat(scores, group_starts)
+    
+    # Take the top-k cases by their best paragraph score, and the top 3 paragraphs of each: the
+    # paragraphs of those cases sorted by case rank, then score, then paragraph (ties go first)
+    groups = top_k_indices(case_best, top_k)
+    lengths = group_ends[groups] - group_starts[groups]
+    offsets = np.cumsum(lengths) - lengths
+    owner = np.repeat(np.arange(len(groups)), lengths)
+    rows = np.arange(int(lengths.sum())) - offsets[owner] + group_starts[groups][owner]
+    order = np.lexsort((rows, -scores[rows], owner))
+    best = order[np.arange(len(order)) - offsets[owner] < 3]
+    top_cases = [(case, []) for case in para_cases[group_starts[groups]].tolist()]
+    for group, position, score in zip(owner[best].tolist(), para_positions[rows[best]].tolist(),
+                                      scores[rows[best]].tolist()):
+        top_cases[group][1].append((position, score))
+    return top_cases
+
+
+def build_results(corpus, top_cases, query_terms):
+    """Build the result cases and passage chunks of ``top_cases`` (see rank_cases and search)."""
+    taxonomy = load_taxonomy()
+    all_results = []
+    all_chunks = []
+    
+    # Load only the paragraphs the results show, in one store lookup
+    needed = set()
+    for case_idx, matches in top_cases:
+        num_paragraphs = corpus.index.num_paragraphs(case_idx)
+        for para_idx, _ in matches:
+            needed.update((case_idx, pos) for pos in (para_idx - 1, para_idx, para_idx + 1)
+                          if 0 <= pos < num_paragraphs)
+    texts = corpus.store.get_paragraphs(sorted(needed))
+
+    for case_idx, matches in top_cases:
+        case = corpus.cases.record(case_idx)
+        num_paragraphs = corpus.index.num_paragraphs(case_idx)
+        first_para = corpus.index.paragraph_id(case_idx, 0)
+
+        case_chunks = []
+        for para_idx, score in matches:
+            para = texts[(case_idx, para_idx)]
+
+            # Get explanation from the query and the paragraph's precomputed passage topic
+            explanation = taxonomy.explain(query_terms, corpus.index.passage_topic(first_para + para_idx))
+
+            # Find the surrounding paragraphs for context
+            context_paragraphs = []
+
+            # Get paragraph before (if available)
+            if para_idx > 0:
+                context_paragraphs.append({"text": texts[(case_idx, para_idx - 1)], "position": "before"})
+
+            # The matched paragraph itself
+            context_paragraphs.append({"text": para, "position": "match", "score": score})
+
+            # Get paragraph after (if available)
+            if para_idx < num_paragraphs - 1:
+                context_paragraphs.append({"text": texts[(case_idx, para_idx + 1)], "position": "after"})
+
+            # Create a chunk with the set of context paragraphs
+            chunk = {
+                "case_id": case["id"],
+                "case_title": case["title"],
+                "paragraphs": context_paragraphs,
+                "relevance_score": score,
+                "explanation": explanation if explanation else "No specific explanation available."
+            }
+
+            case_chunks.append(chunk)
+
+        all_chunks.extend(case_chunks)
+
+        # Add case to results
+        case["relevant_chunks"] = case_chunks
+        all_results.append(case)
+    
+    # Sort the (at most top_k * 3) chunks by relevance
+    all_chunks = sorted(all_chunks, key=lambda x: x["relevance_score"], reverse=True)
+    return all_results, all_chunks
+
+
+# Function to generate properly formatted citation for a case
+def generate_citation(case):
+    """Generate a properly formatted citation for academic or legal reference."""
+    # Format: "Case ID, Case Title, Court of Arbitration for Sport (Decision Date)"
+    citation = f"{case['id']}, {case['title']}, Court of Arbitration for Sport ({case['date']})"
+    return citation
+
+
+# Generate a concise summary of a case for search results - shorter versions
+def generate_case_summary(case):
+    case_id = case['id']
+    
+    # Pre-defined summaries for each case in our dataset - more concise versions
+    summaries = {
+        "CAS 2020/A/6978": "Dispute over a €30M buy-out clause in player Diego Costa's contract. Atlético Madrid sought higher compensation after Chelsea signed the player.",
+        
+        "CAS 2011/A/2596": "Club terminated coach's contract after poor sporting results. Coach contested termination was without just cause and sought compensation.",
+        
+        "CAS 2023/A/9872": "Challenge to regulatory decision denying satellite frequency authorization, with additional satellite collision incident raising security concerns."
+    }
+    
+    # Return the appropriate summary or a generic one if not found
+    if case_id in summaries:
+        return summaries[case_id]
+    else:
+        # Generate a generic summary based on available information
+        return f"Dispute between {case['claimant']} and {case['respondent']} regarding {', '.join(case['keywords'][:2])}."
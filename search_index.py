@@ -0,0 +1,437 @@
+import bisect
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from explanations import PASSAGE_TOPIC_DTYPE, load_taxonomy
+
+# Words, keeping internal hyphens and apostrophes together ("buy-out", "player's")
+TOKEN_PATTERN = re.compile(r"\w+(?:[-'’]\w+)*")
+COMPOUND_SEPARATORS = re.compile(r"[-'’]")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Positional postings are compared as (paragraph id * POSITION_STRIDE + position) keys
+POSITION_STRIDE = 1 << 24
+
+
+def split_paragraphs(full_text):
+    """Split a decision's full text into cleaned, non-empty paragraphs."""
+    paragraphs = []
+    for p in full_text.split("\n\n"):
+        p = p.strip()
+        if p:
+            paragraphs.append(p)
+    return paragraphs
+
+
+def tokenize(text):
+    """Lowercase a piece of text and split it into query terms."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def term_positions(text):
+    """Return the ``(term, position)`` pairs indexed for a paragraph.
+
+    Compound words are indexed both whole and by their parts, so "buy-out"
+    is found by the queries "buy-out", "buy" and "out". The whole word
+    takes the position of its first part and each part one position, so
+    both "buy-out clause" and "buy out clause" are phrases of the text
+    "buy-out clause".
+    """
+    pairs = []
+    position = 0
+    for token in tokenize(text):
+        pairs.append((token, position))
+        if COMPOUND_SEPARATORS.search(token):
+            parts = [part for part in COMPOUND_SEPARATORS.split(token) if part]
+            pairs.extend((part, position + i) for i, part in enumerate(parts))
+            position += max(len(parts), 1)
+        else:
+            position += 1
+    return pairs
+
+
+def index_terms(text):
+    """Return the terms indexed for a paragraph (see term_positions)."""
+    return [term for term, _ in term_positions(text)]
+
+
+class StringColumn:
+    """Strings packed into one contiguous UTF-8 buffer, addressed by offsets.
+
+    A column of text costs two NumPy arrays instead of one Python object per
+    string, and can be saved and memory-mapped like any other array; a
+    string is only decoded when it is read. None is stored as "".
+    """
+
+    __slots__ = ("buffer", "offsets")
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer        # uint8
+        self.offsets = offsets      # int64, one more than the strings
+
+    @classmethod
+    def pack(cls, strings):
+        encoded = [(s or "").encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def concat(self, other):
+        """Return a new column with the strings of ``other`` after these."""
+        return StringColumn(np.concatenate([self.buffer, other.buffer]),
+                            np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]]))
+
+
+class IndexSegment:
+    """Frozen postings for a contiguous range of cases.
+
+    Paragraph ids inside a segment are local (0-based); the segment knows
+    the global case row and paragraph id it starts at. Postings are flat
+    NumPy arrays, one slice per term, so a segment saved to disk can be
+    memory-mapped back without any parsing. Every posting also points to
+    the positions of the term in the paragraph, for phrase and proximity
+    queries. The passage topic code of every paragraph (see
+    explanations.Taxonomy) is kept next to the postings; the paragraph
+    text stays in the corpus store.
+    """
+
+    # Arrays written by save() and memory-mapped back by load()
+    ARRAYS = ("post_offsets", "post_docs", "post_tfs", "post_pos_offsets", "positions",
+              "para_case", "para_pos", "doc_len", "case_offsets", "passage_topic")
+
+    def __init__(self, first_row, first_para):
+        self.first_row = first_row
+        self.first_para = first_para
+        self.name = None           # directory name, once saved
+
+    @classmethod
+    def build(cls, cases, first_row=0, first_para=0):
+        """Build a segment from an iterable of per-case paragraph lists."""
+        taxonomy = load_taxonomy()
+        term_postings = {}         # term -> list of (local paragraph id, positions of the term)
+        para_case, para_pos, doc_len, case_offsets, passage_topic = [], [], [], [0], []
+        for case_idx, paragraphs in enumerate(cases, start=first_row):
+            for pos, para in enumerate(paragraphs):
+                para_id = len(para_case)
+                pairs = term_positions(para)
+                passage_topic.append(taxonomy.passage_topic(para))
+                para_case.append(case_idx)
+                para_pos.append(pos)
+                doc_len.append(len(pairs))
+                by_term = {}
+                for term, position in pairs:
+                    by_term.setdefault(term, []).append(position)
+                for term, occurrences in by_term.items():
+                    term_postings.setdefault(term, []).append((para_id, occurrences))
+            case_offsets.append(len(para_case))
+
+        segment = cls(first_row, first_para)
+        terms = sorted(term_postings)
+        segment.terms = terms
+        segment.vocab = {term: term_id for term_id, term in enumerate(terms)}
+        lengths = np.fromiter((len(term_postings[t]) for t in terms), dtype=np.int64, count=len(terms))
+        segment.post_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=segment.post_offsets[1:])
+        segment.post_docs = np.empty(segment.post_offsets[-1], dtype=np.int32)
+        segment.post_tfs = np.empty(segment.post_offsets[-1], dtype=np.float32)
+        positions = []
+        for term_id, term in enumerate(terms):
+            start, end = segment.post_offsets[term_id], segment.post_offsets[term_id + 1]
+            postings = term_postings[term]
+            segment.post_docs[start:end] = [doc for doc, _ in postings]
+            segment.post_tfs[start:end] = [len(occurrences) for _, occurrences in postings]
+            for _, occurrences in postings:
+                positions.extend(occurrences)
+        segment.post_pos_offsets = np.zeros(len(segment.post_docs) + 1, dtype=np.int64)
+        np.cumsum(segment.post_tfs, out=segment.post_pos_offsets[1:], dtype=np.int64)
+        segment.positions = np.asarray(positions, dtype=np.int32)
+        segment.para_case = np.asarray(para_case, dtype=np.int32)
+        segment.para_pos = np.asarray(para_pos, dtype=np.int32)
+        segment.doc_len = np.asarray(doc_len, dtype=np.float32)
+        segment.case_offsets = np.asarray(case_offsets, dtype=np.int64)
+        segment.passage_topic = np.asarray(passage_topic, dtype=PASSAGE_TOPIC_DTYPE)
+        return segment
+
+    @property
+    def num_cases(self):
+        return len(self.case_offsets) - 1
+
+    @property
+    def num_docs(self):
+        return len(self.doc_len)
+
+    def save(self, directory):
+        """Write the segment into a fresh directory (segments are never rewritten in place)."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+        terms = self.terms
+        with open(os.path.join(directory, "segment.json"), "w", encoding="utf-8") as f:
+            json.dump({"first_row": self.first_row, "first_para": self.first_para, "terms": terms,
+                       "passage_topics": load_taxonomy().passage_fingerprint}, f)
+        self.name = os.path.basename(directory)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, "segment.json"), encoding="utf-8") as f:
+            header = json.load(f)
+        # Passage topic codes matched with other taxonomy keywords are stale: rebuild
+        if header.get("passage_topics") != load_taxonomy().passage_fingerprint:
+            raise ValueError(f"Segment {directory} was indexed with another relevance taxonomy")
+        segment = cls(header["first_row"], header["first_para"])
+        segment.terms = header["terms"]
+        segment.vocab = {term: term_id for term_id, term in enumerate(segment.terms)}
+        for name in cls.ARRAYS:
+            setattr(segment, name, np.load(os.path.join(directory, name + ".npy"), mmap_mode="r" if mmap else None))
+        segment.name = os.path.basename(directory)
+        return segment
+
+
+class ParagraphIndex:
+    """Paragraph-level inverted index and BM25 ranker over the decision corpus.
+
+    Every cleaned paragraph gets a global paragraph id, assigned in case
+    order, so the paragraphs of one case always form a contiguous id range.
+    The index is a list of immutable segments, each covering the cases added
+    by one ingestion; adding cases creates a new index that shares the
+    existing segments, so new decisions never require a full rebuild.
+    Document frequencies and average paragraph length for BM25 are combined
+    across segments at query time, from the postings the query touches.
+
+    Matches are reported as ``(case row, position)`` pairs or global
+    paragraph ids; locate() maps ids to pairs, which key the paragraph
+    text in the corpus store.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, segments=(), generation=None):
+        self.segments = list(segments)
+        self.generation = generation    # corpus store generation this index reflects
+        self._first_rows = np.array([s.first_row for s in self.segments], dtype=np.int64)
+        self._first_paras = np.array([s.first_para for s in self.segments], dtype=np.int64)
+        self.num_cases = sum(s.num_cases for s in self.segments)
+        self.num_docs = sum(s.num_docs for s in self.segments)
+        total_len = sum(float(s.doc_len.sum()) for s in self.segments)
+        self.avg_len = total_len / self.num_docs if self.num_docs else 0.0
+
+    @classmethod
+    def build(cls, cases, generation=None):
+        """Build a single-segment index from an iterable of per-case paragraph lists."""
+        return cls([IndexSegment.build(cases)], generation)
+
+    def with_cases(self, cases, generation=None):
+        """Return a new index with one more segment holding ``cases`` (rows num_cases onwards)."""
+        segment = IndexSegment.build(cases, self.num_cases, self.num_docs)
+        return ParagraphIndex(self.segments + [segment], generation)
+
+    @classmethod
+    def for_store(cls, store):
+        """Return the index for a corpus store, reusing its persisted segments when possible.
+
+        Cases the persisted index does not cover yet are indexed into a new
+        segment (and persisted) rather than rebuilding the whole index.
+        """
+        generation = store.generation()
+        index = cls.load(store.index_dir) if store.index_dir else None
+        if index is None or index.num_cases > store.num_cases():
+            index = cls(generation=generation)
+        return index.refreshed(store, generation)
+
+    def refreshed(self, store, generation=None):
+        """Return an index covering every case in ``store``, sharing this index's segments.
+
+        The index is persisted, unless the store's index is read-only.
+        """
+        generation = store.generation() if generation is None else generation
+        index = self
+        if store.num_cases() > self.num_cases:
+            cases = (paragraphs for _, paragraphs in store.iter_case_paragraphs(self.num_cases))
+            index = self.with_cases(cases, generation)
+        index.generation = generation
+        if store.index_dir and not store.index_read_only and (index is not self or not self.segments):
+            index.save(store.index_dir)
+        return index
+
+    def save(self, directory):
+        """Persist the index: write any unsaved segment, then swap the manifest atomically."""
+        os.makedirs(directory, exist_ok=True)
+        for segment in self.segments:
+            if segment.name is None or not os.path.isdir(os.path.join(directory, segment.name)):
+                segment.save(tempfile.mkdtemp(prefix=f"segment-{segment.first_row:08d}-", dir=directory))
+        manifest = {"generation": self.generation, "segments": [s.name for s in self.segments]}
+        fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(directory, self.MANIFEST))
+
+        # Segments dropped from the manifest (after a rebuild) are no longer needed;
+        # processes that still have them memory-mapped keep their open copies
+        live = set(manifest["segments"])
+        for name in os.listdir(directory):
+            if name.startswith("segment-") and name not in live:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a persisted index, memory-mapping its segments; None if absent or unreadable."""
+        try:
+            with open(os.path.join(directory, cls.MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+            segments = [IndexSegment.load(os.path.join(directory, name), mmap) for name in manifest["segments"]]
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(segments, manifest["generation"])
+
+    def _segment_of_row(self, case_idx):
+        return self.segments[int(np.searchsorted(self._first_rows, case_idx, side="right")) - 1]
+
+    def num_paragraphs(self, case_idx):
+        segment = self._segment_of_row(case_idx)
+        local = case_idx - segment.first_row
+        return int(segment.case_offsets[local + 1] - segment.case_offsets[local])
+
+    def paragraph_id(self, case_idx, position):
+        """Global id of paragraph ``position`` of case ``case_idx``."""
+        segment = self._segment_of_row(case_idx)
+        return segment.first_para + int(segment.case_offsets[case_idx - segment.first_row]) + position
+
+    def passage_topic(self, para_id):
+        """Passage topic code of a paragraph, matched when it was indexed."""
+        segment = self.segments[int(np.searchsorted(self._first_paras, para_id, side="right")) - 1]
+        return int(segment.passage_topic[para_id - segment.first_para])
+
+    def locate(self, para_ids):
+        """Map global paragraph ids to ``(case rows, positions within the case)`` arrays."""
+        seg_idx = np.searchsorted(self._first_paras, para_ids, side="right") - 1
+        rows = np.empty(len(para_ids), dtype=np.int64)
+        positions = np.empty(len(para_ids), dtype=np.int64)
+        for i in np.unique(seg_idx):
+            segment = self.segments[i]
+            sel = seg_idx == i
+            local = para_ids[sel] - segment.first_para
+            rows[sel] = segment.para_case[local]
+            positions[sel] = segment.para_pos[local]
+        return rows, positions
+
+    def term_keys(self, term):
+        """Every occurrence of ``term`` as a sorted array of ``para_id * POSITION_STRIDE + position`` keys."""
+        keys = []
+        for segment in self.segments:
+            term_id = segment.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = segment.post_offsets[term_id], segment.post_offsets[term_id + 1]
+            pos_offsets = segment.post_pos_offsets[start:end + 1]
+            docs = segment.post_docs[start:end].astype(np.int64) + segment.first_para
+            positions = segment.positions[pos_offsets[0]:pos_offsets[-1]]
+            keys.append(np.repeat(docs, np.diff(pos_offsets)) * POSITION_STRIDE + positions)
+        return np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+
+    def term_cases(self, term):
+        """Case rows of the paragraphs containing ``term``, sorted (one row per paragraph)."""
+        rows = []
+        for segment in self.segments:
+            term_id = segment.vocab.get(term)
+            if term_id is not None:
+                docs = segment.post_docs[segment.post_offsets[term_id]:segment.post_offsets[term_id + 1]]
+                rows.append(segment.para_case[docs].astype(np.int64))
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def expand_prefix(self, prefix, limit):
+        """The (at most ``limit``) indexed terms starting with ``prefix``, most frequent first."""
+        doc_freq = {}
+        for segment in self.segments:
+            # Term ids follow the sorted term order, so the terms with the prefix are one range
+            start = bisect.bisect_left(segment.terms, prefix)
+            end = bisect.bisect_left(segment.terms, prefix + "\U0010ffff", start)
+            counts = segment.post_offsets[start + 1:end + 1] - segment.post_offsets[start:end]
+            for term, count in zip(segment.terms[start:end], counts.tolist()):
+                doc_freq[term] = doc_freq.get(term, 0) + count
+        return sorted(doc_freq, key=lambda term: (-doc_freq[term], term))[:limit]
+
+    def score(self, query, case_mask=None, restrict=None, para_range=None):
+        """Score every paragraph that contains at least one query term with BM25.
+
+        If ``case_mask`` is given, only paragraphs of cases where it is true
+        are scored; if ``restrict`` (sorted paragraph ids) is given, only
+        those paragraphs are. If ``para_range`` (``(first, end)`` paragraph
+        ids) is given, only the postings in that range are read, but
+        paragraphs are still scored against the statistics of the whole
+        index. Returns ``(para_ids, scores)`` as arrays sorted by paragraph
+        id, which keeps the paragraphs of each case adjacent.
+        """
+        terms = sorted(set(tokenize(query)))
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if not terms or not self.num_docs:
+            return empty
+
+        doc_freq = np.zeros(len(terms), dtype=np.float64)
+        gathered = []
+        for segment in self.segments:
+            found = [(i, segment.vocab[t]) for i, t in enumerate(terms) if t in segment.vocab]
+            if not found:
+                continue
+            query_pos = np.array([i for i, _ in found])
+            term_ids = np.array([t for _, t in found])
+            starts, ends = segment.post_offsets[term_ids], segment.post_offsets[term_ids + 1]
+            doc_freq[query_pos] += ends - starts
+            if para_range is not None:
+                # Postings are sorted by paragraph id: cut each list to the range
+                first, end = (np.clip(np.asarray(para_range) - segment.first_para, 0, segment.num_docs)
+                              .astype(segment.post_docs.dtype))
+                if first == end:
+                    continue
+                postings = [segment.post_docs[s:e] for s, e in zip(starts, ends)]
+                starts, ends = (starts + np.array([np.searchsorted(docs, first) for docs in postings]),
+                                starts + np.array([np.searchsorted(docs, end) for docs in postings]))
+            docs = np.concatenate([segment.post_docs[s:e] for s, e in zip(starts, ends)])
+            tfs = np.concatenate([segment.post_tfs[s:e] for s, e in zip(starts, ends)])
+            term_of = np.repeat(query_pos, ends - starts)
+            if case_mask is not None:
+                keep = case_mask[segment.para_case[docs]]
+                docs, tfs, term_of = docs[keep], tfs[keep], term_of[keep]
+            if restrict is not None:
+                keep = np.isin(docs.astype(np.int64) + segment.first_para, restrict)
+                docs, tfs, term_of = docs[keep], tfs[keep], term_of[keep]
+            gathered.append((docs.astype(np.int64) + segment.first_para, tfs, term_of, segment.doc_len[docs]))
+        if not gathered:
+            return empty
+
+        docs, tfs, term_of, doc_len = (np.concatenate(parts) for parts in zip(*gathered))
+        idf = np.log1p((self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        len_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / self.avg_len)
+        contributions = idf[term_of] * tfs * (BM25_K1 + 1) / (tfs + len_norm)
+        para_ids, inverse = np.unique(docs, return_inverse=True)
+        return para_ids, np.bincount(inverse, weights=contributions).astype(np.float32)
+
+
+def top_k_indices(values, k):
+    """Indices of the ``k`` largest values, best first, via a partial sort.
+
+    The same as the first ``k`` of a stable descending sort: ties, including
+    ties for the last place, go to the lowest index.
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(values):
+        threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+        above = np.flatnonzero(values > threshold)
+        candidates = np.concatenate([above, np.flatnonzero(values == threshold)[:k - len(above)]])
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.lexsort((candidates, -values[candidates]))]
@@ -0,0 +1,67 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Searches run at once per process, across all sessions
+SEARCH_WORKERS = 4
+
+
+class SearchCancelled(Exception):
+    """Raised for a job cancelled before its search started."""
+
+
+class SearchJob:
+    """Handle on a search submitted to a SearchPool.
+
+    The job is kept in the session state and polled by the script until
+    its search is done. A job cancelled while it is queued never runs; a
+    running search cannot be interrupted, so its result is dropped.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.submitted_at = time.monotonic()
+        self.timings = {}
+        self.counters = {}
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stop the search if it has not started yet."""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise SearchCancelled()
+
+
+class SearchPool:
+    """Worker threads shared by every session of the app process.
+
+    Searches run off the Streamlit script thread, so a slow query never
+    blocks its session's reruns, and at most ``max_workers`` of them run
+    at once however many sessions are searching.
+    """
+
+    def __init__(self, max_workers=SEARCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+
+    def submit(self, query, func, *args, **kwargs):
+        """Run ``func(*args, job=job, **kwargs)`` on the pool; returns the SearchJob."""
+        job = SearchJob(query)
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job, func, args, kwargs):
+        job.check_cancelled()
+        return func(*args, job=job, **kwargs)
@@ -0,0 +1,85 @@
+import cProfile
+import datetime
+import io
+import json
+import pstats
+import threading
+import time
+
+# Functions listed in a profile report, the most expensive (cumulative time) first
+PROFILE_LINES = 30
+
+
+def profiled(func, *args, **kwargs):
+    """Call ``func`` under cProfile; returns ``(its result, a text report of the profile)``.
+
+    Only the calling thread is profiled: the work done on the hybrid
+    retriever threads or on the shard worker processes shows as waits.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return result, report.getvalue()
+
+
+class SearchMetrics:
+    """Per-stage timings and work counters of the requests of a process, accumulated.
+
+    Each request records its ``timings`` (stage -> seconds, as the search
+    functions fill them), its ``counters`` (name -> count) and its whole
+    latency under a kind ("find", "resolve", "live", ...). snapshot()
+    gives the totals, for the /metrics endpoint; if ``log`` (a text file)
+    is given, every request is also written to it as a JSON line.
+    """
+
+    def __init__(self, log=None):
+        self.log = log
+        self.started = time.time()
+        self._requests = {}     # kind -> [count, total seconds, max seconds]
+        self._stages = {}       # stage -> [count, total seconds, max seconds]
+        self._counters = {}     # name -> total
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _add(totals, key, seconds):
+        entry = totals.setdefault(key, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def record(self, kind, seconds, timings=None, counters=None):
+        """Add a request of ``kind`` that took ``seconds``."""
+        timings, counters = timings or {}, counters or {}
+        with self._lock:
+            self._add(self._requests, kind, seconds)
+            for stage, stage_seconds in timings.items():
+                self._add(self._stages, stage, stage_seconds)
+            for name, count in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + count
+            if self.log is not None:
+                self.log.write(json.dumps({
+                    "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+                    "kind": kind,
+                    "ms": round(seconds * 1000, 3),
+                    "timings_ms": {stage: round(s * 1000, 3) for stage, s in timings.items()},
+                    "counters": counters,
+                }) + "\n")
+                self.log.flush()
+
+    def snapshot(self):
+        """The totals so far: request counts and latency per kind, time per stage, and counters."""
+        def summary(count, total, longest):
+            return {"count": count, "total_ms": total * 1000, "mean_ms": total * 1000 / count, "max_ms": longest * 1000}
+
+        with self._lock:
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "requests": {kind: summary(*entry) for kind, entry in self._requests.items()},
+                "stages": {stage: summary(*entry) for stage, entry in self._stages.items()},
+                "counters": dict(self._counters),
+            }
@@ -0,0 +1,559 @@
+"""Serve corpus searches over a local HTTP/JSON API.
+
+Usage:
+    python search_service.py [--store PATH] [--host HOST] [--port PORT] [--shards N] [--metrics-log PATH]
+                             [--query-log PATH] [--verbose]
+
+The service loads the corpus store once and answers searches for any
+number of clients, each request on its own thread; connections are kept
+alive between requests (HTTP/1.1). Start one or more services and point
+the app at them to run the search off the Streamlit process:
+
+    CASELENS_SEARCH_URL=http://127.0.0.1:8765,http://127.0.0.1:8766 streamlit run main.py
+
+With ``--shards N`` the service splits the corpus into N shards, each
+searched by its own worker process (see sharded_search), so keyword
+searches of a large corpus use N cores. With ``--metrics-log PATH`` (``-``
+for stderr) the timings and counters of every request are written to PATH
+as JSON lines; with ``--query-log PATH`` the queries searched are (see
+query_log), for replay.py to replay.
+
+Endpoints:
+    POST /search  {"queries": [{"query", "filters", "top_k", "mode", "ranking"}, ...]}
+                  -> {"responses": [{"results": [...], "timings": {...}, "counters": {...}}
+                  or {"error", "error_type"}, ...]}: "timings" has the seconds spent per stage,
+                  "counters" the cases scanned, paragraphs scored, chunks emitted and cache hits
+                  A batch's queries run concurrently; a single query object
+                  (without "queries") is accepted too. A query with "profile": true
+                  is run under cProfile, and its response gets the report as "profile".
+    POST /find    the same queries -> {"responses": [{"hits": [[case row, paragraph, score], ...],
+                  "timings": {...}, "counters": {...}}, ...]}: the ranking only, no text
+    POST /resolve {"query", "hits": [[case row, paragraph, score], ...]} -> {"results": [...]}:
+                  the result cases and passages of some hits of a query
+    POST /live    {"query", "filters", "top_k"} -> {"hits": [...], "timings": {...}, "counters": {...}}:
+                  the hits of a partly typed query, for search as you type (see SearchService.find_live)
+    POST /facets  {"query", "filters", "mode"} -> {"counts": {filter key: [[value, count], ...]}}:
+                  the sidebar filter option counts (see SearchService.facet_counts)
+    POST /arbitrators {"text", "limit"} -> {"suggestions": [[name, nationalities, decisions], ...]}:
+                  arbitrator names for a partly typed or misspelled name
+    GET  /health  -> {"generation", "decisions", "paragraphs", "semantic", "cache"}
+    GET  /metrics -> {"uptime_seconds", "requests", "stages", "counters"}: request latency per
+                  kind, time per search stage and work counters, since the service started
+                  (see search_metrics.SearchMetrics)
+"""
+import argparse
+import functools
+import http.client
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from arbitrators import SUGGESTION_LIMIT
+from corpus_store import open_corpus_store
+from live_corpus import LiveCorpus
+from live_search import find_live, query_groups
+from query_cache import QueryCache, filter_state_hash, make_query_key
+from query_language import QuerySyntaxError, is_structured
+from query_log import QueryLog
+from search_engine import (HIT_DTYPE, MAX_RESULTS, build_results, candidate_cases, explanation_terms, find_cases,
+                           hit_case_starts, pack_hits, unpack_hits)
+from search_metrics import SearchMetrics, profiled
+from sharded_search import ShardedSearch
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Size and freshness limits of the query result cache
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL_SECONDS = 600
+
+# Queries whose matching decisions, and (query, filter state) pairs whose facet counts, are kept
+FACET_CACHE_SIZE = 256
+
+# Term groups of partly typed queries whose matching decisions are kept, for search as you type
+LIVE_CACHE_SIZE = 1024
+
+# Queries of one batch searched at once
+BATCH_WORKERS = 4
+
+# Seconds a client waits for a service's answer
+CLIENT_TIMEOUT = 60
+
+
+def _json_default(value):
+    # Dates in filters, NumPy scalars and arrays in results
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(payload):
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
+def _chunks_of(results):
+    # The chunks of results received as JSON, ordered like search_engine.search orders them
+    return sorted((chunk for result in results for chunk in result["relevant_chunks"]),
+                  key=lambda x: x["relevance_score"], reverse=True)
+
+
+def _query_key(query, filters, top_k, mode, ranking):
+    return make_query_key(query, filters, top_k, mode, tuple(sorted((ranking or {}).items())))
+
+
+def search_request(query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None, profile=False):
+    """The JSON object describing one query of a /search batch."""
+    request = {"query": query, "filters": filters, "top_k": top_k, "mode": mode, "ranking": ranking or {}}
+    if profile:
+        request["profile"] = True
+    return request
+
+
+class SearchService:
+    """The search engine of one process: a LiveCorpus plus shared query result and facet caches.
+
+    The app uses it in-process by default; search_service.py serves it over
+    HTTP to SearchClient. The caches are reset whenever the corpus changes.
+    If ``sharded`` (a ShardedSearch on the same store) is given, searches
+    run on its worker processes. The timings and counters of every request
+    are added to ``metrics`` (a SearchMetrics), and the queries searched
+    are written to ``query_log`` (a QueryLog) if given.
+    """
+
+    def __init__(self, live_corpus, cache_size=QUERY_CACHE_SIZE, cache_ttl=QUERY_CACHE_TTL_SECONDS, sharded=None,
+                 metrics=None, query_log=None):
+        self.live_corpus = live_corpus
+        self.sharded = sharded
+        self.metrics = SearchMetrics() if metrics is None else metrics
+        self.query_log = query_log
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._query_cache = None
+        self._candidate_cache = None
+        self._facet_cache = None
+        self._live_cache = None
+        self._cache_generation = None
+        self._lock = threading.Lock()
+        self._batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+    def _cache(self, generation, kind="results"):
+        # kind: "results" (hits per query), "candidates" (matching decisions per query), "facets", or
+        # "live" (matching decisions per term groups of a partly typed query)
+        with self._lock:
+            if generation != self._cache_generation:
+                self._query_cache = QueryCache(max_entries=self.cache_size, ttl_seconds=self.cache_ttl)
+                self._candidate_cache = QueryCache(max_entries=FACET_CACHE_SIZE, ttl_seconds=self.cache_ttl)
+                self._facet_cache = QueryCache(max_entries=FACET_CACHE_SIZE, ttl_seconds=self.cache_ttl)
+                self._live_cache = QueryCache(max_entries=LIVE_CACHE_SIZE, ttl_seconds=self.cache_ttl)
+                self._cache_generation = generation
+            return {"results": self._query_cache, "candidates": self._candidate_cache, "facets": self._facet_cache,
+                    "live": self._live_cache}[kind]
+
+    def info(self):
+        corpus = self.live_corpus.current()
+        return {
+            "generation": corpus.generation,
+            "decisions": len(corpus.cases),
+            "paragraphs": corpus.index.num_docs,
+            "semantic": corpus.vectors is not None,
+            "cache": self._cache(corpus.generation).stats(),
+        }
+
+    def cached(self, query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None):
+        """The cached hits of a query (see find), or None.
+
+        A query found in the cache is recorded in the metrics and logged
+        like find does. A miss is not counted in the cache stats: the find
+        that follows counts it.
+        """
+        searched_at, started = time.time(), time.perf_counter()
+        corpus = self.live_corpus.current()
+        hits = self._cache(corpus.generation).peek(_query_key(query, filters, top_k, mode, ranking))
+        if hits is not None:
+            seconds = time.perf_counter() - started
+            self.metrics.record("find", seconds, {}, {"cache_hits": 1})
+            self._log_query({"kind": "find", "query": query, "filters": filters, "top_k": top_k, "mode": mode,
+                             "ranking": ranking or {}}, searched_at, seconds, hits, 1)
+        return hits
+
+    def find(self, query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None, timings=None, counters=None):
+        """Rank the current corpus for a query; returns its hits (a HIT_DTYPE array), without any text.
+
+        ``ranking`` holds the hybrid options of search_engine.search. Hits
+        are small, so they are what the result cache keeps. ``counters``
+        gets those of find_cases, and "cache_hits" (1 if the hits were
+        cached, else 0).
+        """
+        searched_at, started = time.time(), time.perf_counter()
+        timings = {} if timings is None else timings
+        counters = {} if counters is None else counters
+        corpus = self.live_corpus.current()
+        ranking = ranking or {}
+        request = {"kind": "find", "query": query, "filters": filters, "top_k": top_k, "mode": mode,
+                   "ranking": ranking}
+        cache = self._cache(corpus.generation)
+        cache_key = _query_key(query, filters, top_k, mode, ranking)
+        hits = cache.get(cache_key)
+        counters["cache_hits"] = int(hits is not None)
+        if hits is None:
+            try:
+                if self.sharded is not None:
+                    top_cases = self.sharded.find(query, filters, top_k, mode, ranking, timings, counters)
+                else:
+                    top_cases = find_cases(corpus, query, filters, top_k, mode, timings=timings, counters=counters,
+                                           **ranking)
+            except ValueError as exc:
+                self._log_query(request, searched_at, time.perf_counter() - started, error=exc)
+                raise
+            hits = pack_hits(top_cases)
+            cache.put(cache_key, hits)
+        seconds = time.perf_counter() - started
+        self.metrics.record("find", seconds, timings, counters)
+        self._log_query(request, searched_at, seconds, hits, counters["cache_hits"])
+        return hits
+
+    def find_live(self, query, filters, top_k=MAX_RESULTS, timings=None, counters=None):
+        """The hits of a partly typed keyword query, for search as you type (see live_search.find_live).
+
+        Each keystroke reuses the matching decisions cached for the one
+        before. A query-language query is found like find does; the search
+        runs in this process even if the service is sharded, as the cached
+        candidates live here.
+        """
+        if is_structured(query):
+            return self.find(query, filters, top_k, timings=timings, counters=counters)
+        searched_at, started = time.time(), time.perf_counter()
+        timings = {} if timings is None else timings
+        counters = {} if counters is None else counters
+        corpus = self.live_corpus.current()
+        groups = query_groups(query)
+        cache = self._cache(corpus.generation)
+        cache_key = (groups, filter_state_hash(filters), top_k, "live")
+        hits = cache.get(cache_key)
+        counters["cache_hits"] = int(hits is not None)
+        if hits is None:
+            hits = find_live(corpus, groups, filters, self._cache(corpus.generation, "live"), top_k, timings,
+                             counters)
+            cache.put(cache_key, hits)
+        seconds = time.perf_counter() - started
+        self.metrics.record("live", seconds, timings, counters)
+        self._log_query({"kind": "live", "query": query, "filters": filters, "top_k": top_k, "mode": "keyword",
+                         "ranking": {}}, searched_at, seconds, hits, counters["cache_hits"])
+        return hits
+
+    def _log_query(self, request, searched_at, seconds, hits=None, cache_hit=0, error=None):
+        # Append a query searched at searched_at (Unix seconds) to the query log, if there is one
+        if self.query_log is None:
+            return
+        outcome = {"latency_ms": round(seconds * 1000, 3), "hits": 0, "cases": 0, "cache_hit": bool(cache_hit)}
+        if hits is not None:
+            outcome.update(hits=len(hits), cases=len(hit_case_starts(hits)))
+        if error is not None:
+            outcome["error"] = str(error)
+        self.query_log.record(searched_at, **request, **outcome)
+
+    def facet_counts(self, query, filters, mode="keyword"):
+        """How many decisions each sidebar filter option would leave (see CaseColumns.facet_counts).
+
+        A keyword query counts only the decisions it matches (a malformed
+        one, like an empty one, counts every decision); semantic and hybrid
+        queries, which rank every decision, count every decision too. The
+        matching decisions of a query, and the counts of each (query, filter
+        state) pair, are cached.
+        """
+        started = time.perf_counter()
+        corpus = self.live_corpus.current()
+        candidate_cache = self._cache(corpus.generation, "candidates")
+        facet_cache = self._cache(corpus.generation, "facets")
+        cache_key = make_query_key(query, filters, mode)
+        counts = facet_cache.get(cache_key)
+        if counts is not None:
+            self.metrics.record("facets", time.perf_counter() - started, counters={"cache_hits": 1})
+            return counts
+        candidates = None
+        if mode == "keyword" and query.strip():
+            candidates = candidate_cache.get(cache_key[0])
+            if candidates is None:
+                try:
+                    candidates = candidate_cases(corpus, query)
+                except QuerySyntaxError:
+                    candidates = np.ones(len(corpus.cases), dtype=bool)
+                candidate_cache.put(cache_key[0], candidates)
+        counts = corpus.columns.facet_counts(filters, candidates)
+        facet_cache.put(cache_key, counts)
+        self.metrics.record("facets", time.perf_counter() - started, counters={"cache_hits": 0})
+        return counts
+
+    def arbitrator_suggestions(self, text, limit=SUGGESTION_LIMIT):
+        """Arbitrators of the current corpus for a partly typed name (see ArbitratorIndex.suggestions)."""
+        return self.live_corpus.current().columns.arbitrators.suggestions(text, limit)
+
+    def resolve(self, query, hits):
+        """The ``(results, chunks)`` of some hits of ``query``, with their text read from the current corpus."""
+        started = time.perf_counter()
+        top_cases = unpack_hits(hits)
+        if self.sharded is not None:
+            results, chunks = self.sharded.build(query, top_cases)
+        else:
+            results, chunks = build_results(self.live_corpus.current(), top_cases, explanation_terms(query))
+        seconds = time.perf_counter() - started
+        self.metrics.record("resolve", seconds, {"passages": seconds},
+                            {"cases_resolved": len(top_cases), "chunks_emitted": len(chunks)})
+        return results, chunks
+
+    def search(self, query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None, timings=None, counters=None):
+        """Search the current corpus: find, then resolve every hit (see search_engine.search)."""
+        timings = {} if timings is None else timings
+        counters = {} if counters is None else counters
+        hits = self.find(query, filters, top_k, mode, ranking, timings, counters)
+        if len(hits) == 0:
+            return [], []
+        started = time.perf_counter()
+        results, chunks = self.resolve(query, hits)
+        timings["passages"] = time.perf_counter() - started
+        counters["chunks_emitted"] = len(chunks)
+        return results, chunks
+
+    def _answer(self, request, find_only=False):
+        timings, counters = {}, {}
+        answer = {"timings": timings, "counters": counters}
+        try:
+            args = (request["query"], request.get("filters") or {}, request.get("top_k", MAX_RESULTS),
+                    request.get("mode", "keyword"), request.get("ranking"))
+            run = self.find if find_only else self.search
+            if request.get("profile"):
+                found, answer["profile"] = profiled(run, *args, timings=timings, counters=counters)
+            else:
+                found = run(*args, timings=timings, counters=counters)
+        except (QuerySyntaxError, KeyError, TypeError, ValueError) as exc:
+            return {"error": str(exc), "error_type": type(exc).__name__}
+        if find_only:
+            answer["hits"] = found.tolist()
+        else:
+            answer["results"] = [dict(result) for result in found[0]]
+        return answer
+
+    def search_batch(self, requests, find_only=False):
+        """Answer a batch of search_request() objects concurrently, in order (with hits only if ``find_only``)."""
+        return list(self._batch_pool.map(functools.partial(self._answer, find_only=find_only), requests))
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps client connections open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def _send(self, status, payload):
+        body = to_json(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.server.service.info())
+        elif self.path == "/metrics":
+            self._send(200, self.server.service.metrics.snapshot())
+        else:
+            self._send(404, {"error": f"no such endpoint: {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/search", "/find", "/live", "/resolve", "/facets", "/arbitrators"):
+            self._send(404, {"error": f"no such endpoint: {self.path}"})
+            return
+        service = self.server.service
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if self.path == "/resolve":
+                hits = np.array([tuple(hit) for hit in body["hits"]], dtype=HIT_DTYPE)
+                results, _ = service.resolve(body["query"], hits)
+                self._send(200, {"results": [dict(result) for result in results]})
+                return
+            if self.path == "/live":
+                timings, counters = {}, {}
+                try:
+                    hits = service.find_live(body["query"], body.get("filters") or {},
+                                             body.get("top_k", MAX_RESULTS), timings, counters)
+                except QuerySyntaxError as exc:
+                    self._send(200, {"error": str(exc), "error_type": type(exc).__name__})
+                    return
+                self._send(200, {"hits": hits.tolist(), "timings": timings, "counters": counters})
+                return
+            if self.path == "/facets":
+                counts = service.facet_counts(body["query"], body.get("filters") or {}, body.get("mode", "keyword"))
+                # As pairs: JSON object keys would turn years into strings
+                self._send(200, {"counts": {key: list(by_value.items()) for key, by_value in counts.items()}})
+                return
+            if self.path == "/arbitrators":
+                suggestions = service.arbitrator_suggestions(body["text"], body.get("limit", SUGGESTION_LIMIT))
+                self._send(200, {"suggestions": suggestions})
+                return
+            requests = body["queries"] if "queries" in body else [body]
+        except (ValueError, TypeError, KeyError) as exc:
+            self._send(400, {"error": f"malformed request: {exc}"})
+            return
+        self._send(200, {"responses": service.search_batch(requests, find_only=self.path == "/find")})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class SearchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, SearchRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+class SearchClient:
+    """Client of one or more search services, with the SearchService search interface.
+
+    Queries go round-robin to the services at ``urls`` (a list, or a
+    comma-separated string), over one kept-alive connection per service and
+    calling thread. Results come back as dicts, all at once: a remote
+    search has no partial results, and caching is left to the services.
+    """
+
+    def __init__(self, urls, timeout=CLIENT_TIMEOUT):
+        if isinstance(urls, str):
+            urls = urls.split(",")
+        self.addresses = [(parts.hostname, parts.port or 80) for parts in map(urlsplit, urls)]
+        if not self.addresses:
+            raise ValueError("no search service URL given")
+        self.timeout = timeout
+        self._turn = itertools.count()
+        self._local = threading.local()
+
+    def _request(self, method, path, payload=None):
+        address = self.addresses[next(self._turn) % len(self.addresses)]
+        connections = self._local.__dict__.setdefault("connections", {})
+        body = None if payload is None else to_json(payload)
+        for attempt in range(2):
+            if address not in connections:
+                connections[address] = http.client.HTTPConnection(*address, timeout=self.timeout)
+            connection = connections[address]
+            try:
+                connection.request(method, path, body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The service closed the kept-alive connection (or restarted): reconnect once
+                connection.close()
+                del connections[address]
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"search service {address[0]}:{address[1]} answered {response.status}: "
+                               f"{data.decode('utf-8', 'replace')}")
+        return json.loads(data)
+
+    def info(self):
+        return self._request("GET", "/health")
+
+    def metrics(self):
+        """The metrics of the next service in turn (see SearchMetrics.snapshot)."""
+        return self._request("GET", "/metrics")
+
+    def cached(self, query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None):
+        return None
+
+    def search_batch(self, requests, find_only=False):
+        return self._request("POST", "/find" if find_only else "/search", {"queries": requests})["responses"]
+
+    def _one(self, request, find_only, timings, counters):
+        response = self.search_batch([request], find_only)[0]
+        if "error" in response:
+            error = QuerySyntaxError if response["error_type"] == "QuerySyntaxError" else ValueError
+            raise error(response["error"])
+        if timings is not None:
+            timings.update(response["timings"])
+        if counters is not None:
+            counters.update(response["counters"])
+        return response
+
+    def find(self, query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None, timings=None, counters=None):
+        response = self._one(search_request(query, filters, top_k, mode, ranking), True, timings, counters)
+        return np.array([tuple(hit) for hit in response["hits"]], dtype=HIT_DTYPE)
+
+    def find_live(self, query, filters, top_k=MAX_RESULTS, timings=None, counters=None):
+        response = self._request("POST", "/live", {"query": query, "filters": filters, "top_k": top_k})
+        if "error" in response:
+            raise QuerySyntaxError(response["error"])
+        if timings is not None:
+            timings.update(response["timings"])
+        if counters is not None:
+            counters.update(response["counters"])
+        return np.array([tuple(hit) for hit in response["hits"]], dtype=HIT_DTYPE)
+
+    def facet_counts(self, query, filters, mode="keyword"):
+        counts = self._request("POST", "/facets", {"query": query, "filters": filters, "mode": mode})["counts"]
+        return {key: dict((value, count) for value, count in pairs) for key, pairs in counts.items()}
+
+    def arbitrator_suggestions(self, text, limit=SUGGESTION_LIMIT):
+        suggestions = self._request("POST", "/arbitrators", {"text": text, "limit": limit})["suggestions"]
+        return [tuple(suggestion) for suggestion in suggestions]
+
+    def resolve(self, query, hits):
+        results = self._request("POST", "/resolve", {"query": query, "hits": hits.tolist()})["results"]
+        return results, _chunks_of(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve corpus searches over HTTP/JSON.")
+    parser.add_argument("--store", help="corpus store path (default: $CASELENS_CORPUS or data/caselens.sqlite)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="search on N worker processes, one per shard of the corpus (default: in-process)")
+    parser.add_argument("--metrics-log", metavar="PATH",
+                        help="append the timings and counters of every request to PATH as JSON lines (- for stderr)")
+    parser.add_argument("--query-log", metavar="PATH",
+                        help="append every query searched, with its filters, latency and result counts, to PATH")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    metrics_log = None
+    if args.metrics_log:
+        metrics_log = sys.stderr if args.metrics_log == "-" else open(args.metrics_log, "a", encoding="utf-8")
+    # Loading the corpus brings the persisted index up to date, once, before the shard workers load it
+    live_corpus = LiveCorpus(open_corpus_store(args.store))
+    sharded = ShardedSearch(args.store, args.shards) if args.shards > 0 else None
+    query_log = QueryLog(args.query_log) if args.query_log else None
+    service = SearchService(live_corpus, sharded=sharded, metrics=SearchMetrics(metrics_log), query_log=query_log)
+    info = service.info()
+    server = SearchServer((args.host, args.port), service, verbose=args.verbose)
+    print(f"Serving {info['decisions']} decisions on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if sharded is not None:
+            sharded.close()
+        if metrics_log not in (None, sys.stderr):
+            metrics_log.close()
+        if query_log is not None:
+            query_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import bisect
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from corpus_store import open_corpus_store
+from live_corpus import LiveCorpus
+from query_language import parse_query
+from search_engine import MAX_RESULTS, build_results, explanation_terms, find_cases, lexical_score, rank_cases
+from search_index import top_k_indices
+
+# The corpus of a shard worker process, loaded once by _init_worker
+_live_corpus = None
+
+
+def _init_worker(location):
+    global _live_corpus
+    # The parent keeps the persisted index up to date; a worker that finds it behind the store
+    # indexes the missing cases in memory, as concurrent saves would drop each other's segments
+    store = open_corpus_store(location)
+    store.index_read_only = True
+    _live_corpus = LiveCorpus(store)
+
+
+def _num_cases():
+    return len(_live_corpus.current().cases)
+
+
+def _rank_shard(first_case, end_case, query, filters, top_k):
+    # Only the postings of the shard's paragraphs are read, but every paragraph is still scored
+    # against the statistics of the whole index, so the scores are exactly those of a
+    # single-process search
+    corpus = _live_corpus.current()
+    timings = {}
+    started = time.perf_counter()
+    case_mask = corpus.columns.mask(filters)
+    case_mask[:first_case] = False
+    if end_case is not None:
+        case_mask[end_case:] = False
+    index = corpus.index
+    para_range = (index.paragraph_id(first_case, 0),
+                  index.num_docs if end_case is None else index.paragraph_id(end_case, 0))
+    timings["filters"] = time.perf_counter() - started
+    started = time.perf_counter()
+    para_ids, scores = lexical_score(index, query, parse_query(query), case_mask, para_range)
+    timings["lexical"] = time.perf_counter() - started
+    counters = {"cases_scanned": int(np.count_nonzero(case_mask)), "paragraphs_scored": len(para_ids)}
+    if len(para_ids) == 0:
+        return [], timings, counters
+    return rank_cases(corpus, para_ids, scores, top_k), timings, counters
+
+
+def _build_shard(top_cases, terms):
+    results, _ = build_results(_live_corpus.current(), top_cases, terms)
+    return results
+
+
+def _find_whole(query, filters, top_k, mode, ranking):
+    timings, counters = {}, {}
+    top_cases = find_cases(_live_corpus.current(), query, filters, top_k, mode, timings=timings, counters=counters,
+                           **ranking)
+    return top_cases, timings, counters
+
+
+class ShardedSearch:
+    """Keyword search fanned out to one worker process per shard of the corpus.
+
+    Shards are contiguous ranges of case rows (the last one also takes the
+    decisions added later). Every worker opens the store at ``location``
+    and memory-maps the same persisted index, so the index pages are shared
+    between the processes; the workers never write the index, so it should
+    be brought up to date before they start. A query is ranked on all shards at once; the
+    best cases of each are merged into the global top-k, and each shard
+    then builds the passages of its own cases in that list. The output is
+    identical to search() in a single process.
+
+    Semantic and hybrid queries, and re-ranked ones, rank against the
+    whole corpus; they are ranked unsharded, on the workers in turn.
+    """
+
+    def __init__(self, location, num_shards):
+        context = multiprocessing.get_context("spawn")
+        self.workers = [ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker,
+                                            initargs=(location,))
+                        for _ in range(num_shards)]
+        # Start the workers (and load the corpus in each) in parallel
+        num_cases = [f.result() for f in [worker.submit(_num_cases) for worker in self.workers]][0]
+        bounds = np.linspace(0, num_cases, num_shards + 1).round().astype(int).tolist()
+        self.shards = list(zip(bounds[:-1], bounds[1:-1] + [None]))
+        self._turn = itertools.count()
+
+    def close(self):
+        for worker in self.workers:
+            worker.shutdown(cancel_futures=True)
+
+    def _shard_of(self, case_idx):
+        return bisect.bisect_right([first for first, _ in self.shards], case_idx) - 1
+
+    def find(self, query, filters, top_k=MAX_RESULTS, mode="keyword", ranking=None, timings=None, counters=None):
+        """Rank like search_engine.find_cases; returns the top ``(case row, matches)`` pairs.
+
+        Stage timings are those of the slowest shard; counters are summed over the shards.
+        """
+        ranking = ranking or {}
+        timings = {} if timings is None else timings
+        counters = {} if counters is None else counters
+        if mode != "keyword" or ranking.get("rerank_results"):
+            worker = self.workers[next(self._turn) % len(self.workers)]
+            top_cases, worker_timings, worker_counters = worker.submit(
+                _find_whole, query, filters, top_k, mode, ranking).result()
+            timings.update(worker_timings)
+            counters.update(worker_counters)
+            return top_cases
+
+        ranked = [worker.submit(_rank_shard, first, end, query, filters, top_k)
+                  for worker, (first, end) in zip(self.workers, self.shards)]
+        candidates = []     # (case row, matches), in case row order
+        for future in ranked:
+            shard_cases, shard_timings, shard_counters = future.result()
+            candidates.extend(sorted(shard_cases))
+            for stage, seconds in shard_timings.items():
+                timings[stage] = max(timings.get(stage, 0.0), seconds)
+            for name, count in shard_counters.items():
+                counters[name] = counters.get(name, 0) + count
+        if not candidates:
+            return []
+        # The same top-k (ties to the earlier case) as rank_cases over the whole corpus
+        best = np.array([matches[0][1] for _, matches in candidates], dtype=np.float32)
+        return [candidates[i] for i in top_k_indices(best, top_k)]
+
+    def build(self, query, top_cases):
+        """The ``(results, chunks)`` of ``top_cases``, each shard building the passages of its own cases."""
+        terms = explanation_terms(query)
+        shard_of = [self._shard_of(case_idx) for case_idx, _ in top_cases]
+        built = {shard: self.workers[shard].submit(
+                     _build_shard, [case for case, s in zip(top_cases, shard_of) if s == shard], terms)
+                 for shard in sorted(set(shard_of))}
+        shard_results = {shard: iter(future.result()) for shard, future in built.items()}
+        results = [next(shard_results[shard]) for shard in shard_of]
+        chunks = sorted((chunk for result in results for chunk in result["relevant_chunks"]),
+                        key=lambda x: x["relevance_score"], reverse=True)
+        return results, chunks
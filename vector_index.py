@@ -0,0 +1,417 @@
+import collections
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from search_index import tokenize, top_k_indices
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # transformer models are optional; the built-in LSA model needs only NumPy
+    SentenceTransformer = None
+
+# Subdirectory of a store's index directory holding the vector index
+VECTOR_SUBDIR = "vectors"
+
+# Built-in LSA model: embedding size, vocabulary size and paragraphs sampled to fit it
+LSA_DIM = 128
+LSA_MAX_TERMS = 4096
+LSA_SAMPLE_SIZE = 20000
+
+# Paragraphs embedded per batch
+ENCODE_BATCH_SIZE = 1000
+
+# IVF parameters: k-means iterations and sample size, lists probed per query,
+# and how much the corpus may grow before the lists are re-clustered
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE_SIZE = 50000
+DEFAULT_NPROBE = 16
+RETRAIN_GROWTH = 4
+
+# Paragraphs kept per semantic query, before grouping them by case
+SEMANTIC_CANDIDATES = 1000
+
+
+class LSAEncoder:
+    """Latent semantic analysis model fitted on the corpus itself.
+
+    Paragraphs become sublinear TF-IDF vectors over the most frequent
+    terms, projected on the top eigenvectors of the term co-occurrence
+    matrix, so terms used in similar contexts ("dismissal", "termination")
+    end up close together. Runs on the CPU with NumPy alone.
+    """
+
+    name = "lsa"
+
+    def __init__(self, vocab, idf, components):
+        self.vocab = vocab
+        self.idf = idf
+        self.components = components
+        self.dim = components.shape[1]
+
+    @classmethod
+    def fit(cls, paragraphs, dim=LSA_DIM, max_terms=LSA_MAX_TERMS):
+        """Fit the model on a list of paragraph texts (a sample of the corpus is enough)."""
+        doc_freq = collections.Counter()
+        for para in paragraphs:
+            doc_freq.update(set(tokenize(para)))
+        # Terms seen in a single paragraph carry no co-occurrence signal; very common ones carry little
+        max_df = max(2, len(paragraphs) // 2)
+        terms = [t for t, df in doc_freq.most_common() if 2 <= df <= max_df][:max_terms]
+        if len(terms) < 2:
+            terms = [t for t, _ in doc_freq.most_common(max_terms)]
+        vocab = {term: term_id for term_id, term in enumerate(terms)}
+        df = np.array([doc_freq[t] for t in terms], dtype=np.float32)
+        idf = (np.log((1 + len(paragraphs)) / (1 + df)) + 1).astype(np.float32)
+
+        encoder = cls(vocab, idf, np.zeros((len(terms), 0), dtype=np.float32))
+        gram = np.zeros((len(terms), len(terms)), dtype=np.float32)
+        for start in range(0, len(paragraphs), ENCODE_BATCH_SIZE):
+            tfidf = encoder._tfidf(paragraphs[start:start + ENCODE_BATCH_SIZE])
+            gram += tfidf.T @ tfidf
+        _, eigenvectors = np.linalg.eigh(gram)
+        encoder.components = np.ascontiguousarray(eigenvectors[:, ::-1][:, :dim], dtype=np.float32)
+        encoder.dim = encoder.components.shape[1]
+        return encoder
+
+    def _tfidf(self, texts):
+        rows, cols = [], []
+        for i, text in enumerate(texts):
+            for term in tokenize(text):
+                term_id = self.vocab.get(term)
+                if term_id is not None:
+                    rows.append(i)
+                    cols.append(term_id)
+        counts = np.zeros((len(texts), len(self.vocab)), dtype=np.float32)
+        np.add.at(counts, (rows, cols), 1)
+        tfidf = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+        return tfidf / np.maximum(norms, 1e-12)
+
+    def encode(self, texts):
+        vectors = self._tfidf(list(texts)) @ self.components
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    @property
+    def model(self):
+        return self.name
+
+    def spec(self):
+        return {"name": self.name, "dim": self.dim}
+
+    def save(self, directory):
+        np.save(os.path.join(directory, "lsa_idf.npy"), self.idf)
+        np.save(os.path.join(directory, "lsa_components.npy"), self.components)
+        with open(os.path.join(directory, "lsa_terms.json"), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.vocab, key=self.vocab.get), f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "lsa_terms.json"), encoding="utf-8") as f:
+            vocab = {term: term_id for term_id, term in enumerate(json.load(f))}
+        return cls(vocab, np.load(os.path.join(directory, "lsa_idf.npy")),
+                   np.load(os.path.join(directory, "lsa_components.npy")))
+
+
+class SentenceTransformerEncoder:
+    """A local sentence-transformers model (e.g. all-MiniLM-L6-v2), run on the CPU."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name):
+        if SentenceTransformer is None:
+            raise RuntimeError("this model needs the 'sentence-transformers' package (pip install sentence-transformers)")
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        vectors = self._model.encode(list(texts), batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+    @property
+    def model(self):
+        return f"{self.name}:{self.model_name}"
+
+    def spec(self):
+        return {"name": self.name, "dim": self.dim, "model": self.model_name}
+
+    def save(self, directory):
+        pass        # the model itself lives in the sentence-transformers cache
+
+    @classmethod
+    def load(cls, directory, spec):
+        return cls(spec["model"])
+
+
+def make_encoder(model, sample_paragraphs=()):
+    """Create the encoder named by ``model``: "lsa" (fitted on the sample) or "sentence-transformers:NAME"."""
+    if model == LSAEncoder.name:
+        return LSAEncoder.fit(list(sample_paragraphs))
+    name, _, model_name = model.partition(":")
+    if name == SentenceTransformerEncoder.name and model_name:
+        return SentenceTransformerEncoder(model_name)
+    raise ValueError(f"unknown embedding model {model!r} (use 'lsa' or 'sentence-transformers:NAME')")
+
+
+def load_encoder(directory, spec, reuse=None):
+    """Load the encoder saved with a vector index, reusing ``reuse`` if it is the same model."""
+    if reuse is not None and reuse.spec() == spec:
+        return reuse
+    if spec["name"] == LSAEncoder.name:
+        return LSAEncoder.load(directory)
+    return SentenceTransformerEncoder.load(directory, spec)
+
+
+def quantize(vectors):
+    """Quantize unit vectors to int8 codes with one float32 scale per row."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def spherical_kmeans(vectors, num_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster unit vectors by cosine similarity; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE_SIZE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        # Empty lists are re-seeded with random vectors
+        empty = np.bincount(assignment, minlength=num_lists) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def assign_lists(vectors, centroids):
+    """Index of the closest centroid for every vector, computed in batches."""
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ENCODE_BATCH_SIZE * 10):
+        batch = np.asarray(vectors[start:start + ENCODE_BATCH_SIZE * 10], dtype=np.float32)
+        assignment[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return assignment
+
+
+class VectorIndex:
+    """Paragraph embeddings with an IVF (inverted file) approximate nearest-neighbour index.
+
+    Row ``i`` of the embedding matrix belongs to global paragraph id ``i``,
+    the same ids the ParagraphIndex uses. Embeddings are stored as int8
+    codes with one scale per row, a quarter of the float32 size, and are
+    memory-mapped when loaded. The vectors are clustered with spherical
+    k-means into about sqrt(N) lists; a query scores the centroids, then
+    only the paragraphs of the closest ``nprobe`` lists, so its cost grows
+    with the size of a few lists rather than with the corpus.
+    """
+
+    ARRAYS = ("codes", "scales", "centroids", "list_offsets", "list_ids")
+    MANIFEST = "manifest.json"
+
+    def __init__(self, encoder, codes, scales, centroids, list_offsets, list_ids,
+                 num_cases, trained_size, generation=None):
+        self.encoder = encoder
+        self.codes = codes
+        self.scales = scales
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.num_cases = num_cases
+        self.trained_size = trained_size    # number of vectors the centroids were trained on
+        self.generation = generation        # corpus store generation this index reflects
+        self.name = None                    # directory name, once saved
+
+    @property
+    def num_docs(self):
+        return len(self.codes)
+
+    @staticmethod
+    def _encode_cases(encoder, cases):
+        """Embed the paragraphs of ``cases`` in batches; returns ``(codes, scales, num_cases)``."""
+        codes, scales, batch, num_cases = [], [], [], 0
+        for paragraphs in cases:
+            num_cases += 1
+            batch.extend(paragraphs)
+            if len(batch) >= ENCODE_BATCH_SIZE:
+                batch_codes, batch_scales = quantize(encoder.encode(batch))
+                codes.append(batch_codes)
+                scales.append(batch_scales)
+                batch = []
+        if batch:
+            batch_codes, batch_scales = quantize(encoder.encode(batch))
+            codes.append(batch_codes)
+            scales.append(batch_scales)
+        if not codes:
+            return np.empty((0, encoder.dim), dtype=np.int8), np.empty(0, dtype=np.float32), num_cases
+        return np.concatenate(codes), np.concatenate(scales), num_cases
+
+    @classmethod
+    def _clustered(cls, encoder, codes, scales, num_cases, generation, centroids=None):
+        vectors = codes.astype(np.float32) * scales[:, None]
+        trained_size = None
+        if centroids is None:
+            num_lists = max(1, min(len(codes), int(np.sqrt(len(codes)))))
+            centroids = spherical_kmeans(vectors, num_lists) if len(codes) else np.zeros((1, encoder.dim), np.float32)
+            trained_size = len(codes)
+        assignment = assign_lists(vectors, centroids)
+        list_ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=list_offsets[1:])
+        return cls(encoder, codes, scales, centroids, list_offsets, list_ids, num_cases, trained_size, generation)
+
+    @classmethod
+    def build(cls, encoder, cases, generation=None):
+        """Embed every paragraph of ``cases`` (per-case paragraph lists) and cluster them."""
+        codes, scales, num_cases = cls._encode_cases(encoder, cases)
+        return cls._clustered(encoder, codes, scales, num_cases, generation)
+
+    def with_cases(self, cases, generation=None):
+        """Return a new index that also covers ``cases`` (rows num_cases onwards).
+
+        New vectors are assigned to the existing lists; once the corpus has
+        grown RETRAIN_GROWTH times past the size the lists were clustered on,
+        the lists are clustered again.
+        """
+        new_codes, new_scales, num_cases = self._encode_cases(self.encoder, cases)
+        codes = np.concatenate([self.codes, new_codes])
+        scales = np.concatenate([self.scales, new_scales])
+        retrain = len(codes) > RETRAIN_GROWTH * max(self.trained_size, 1)
+        index = self._clustered(self.encoder, codes, scales, self.num_cases + num_cases, generation,
+                                None if retrain else self.centroids)
+        if not retrain:
+            index.trained_size = self.trained_size
+        return index
+
+    @classmethod
+    def for_store(cls, store, model=None, rebuild=False):
+        """Return the persisted vector index of ``store``, brought up to date.
+
+        Without a persisted index, with ``rebuild``, or when ``model`` names a
+        different model than the persisted index uses, the encoder named by
+        ``model`` is created, fitted on a sample of the corpus if it needs
+        to be, and every paragraph is embedded.
+        """
+        directory = os.path.join(store.index_dir, VECTOR_SUBDIR)
+        index = None if rebuild else cls.load(directory)
+        if (index is not None and index.num_cases <= store.num_cases()
+                and (model is None or model == index.encoder.model)):
+            return index.refreshed(store)
+
+        generation = store.generation()
+        sample = []
+        if (model or LSAEncoder.name) == LSAEncoder.name:
+            step = max(1, store.num_cases() * 25 // LSA_SAMPLE_SIZE)
+            for row, paragraphs in store.iter_case_paragraphs():
+                if row % step == 0:
+                    sample.extend(paragraphs)
+        encoder = make_encoder(model or LSAEncoder.name, sample[:LSA_SAMPLE_SIZE])
+        cases = (paragraphs for _, paragraphs in store.iter_case_paragraphs())
+        index = cls.build(encoder, cases, generation)
+        index.save(directory)
+        return index
+
+    def refreshed(self, store, generation=None):
+        """Return an index covering every case in ``store``, embedding only the new cases."""
+        generation = store.generation() if generation is None else generation
+        if store.num_cases() <= self.num_cases:
+            return self
+        cases = (paragraphs for _, paragraphs in store.iter_case_paragraphs(self.num_cases))
+        index = self.with_cases(cases, generation)
+        index.save(os.path.join(store.index_dir, VECTOR_SUBDIR))
+        return index
+
+    def save(self, directory):
+        """Write the index into a fresh subdirectory, then swap the manifest atomically."""
+        os.makedirs(directory, exist_ok=True)
+        version_dir = tempfile.mkdtemp(prefix="vectors-", dir=directory)
+        for name in self.ARRAYS:
+            np.save(os.path.join(version_dir, name + ".npy"), getattr(self, name))
+        self.encoder.save(version_dir)
+        header = {"encoder": self.encoder.spec(), "num_cases": self.num_cases,
+                  "trained_size": self.trained_size, "generation": self.generation}
+        with open(os.path.join(version_dir, "vectors.json"), "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        self.name = os.path.basename(version_dir)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"current": self.name}, f)
+        os.replace(tmp_path, os.path.join(directory, self.MANIFEST))
+        # Processes that still have an older version memory-mapped keep their open copies
+        for name in os.listdir(directory):
+            if name.startswith("vectors-") and name != self.name:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @classmethod
+    def current_name(cls, directory):
+        """Name of the version the manifest in ``directory`` points to; None if there is none."""
+        try:
+            with open(os.path.join(directory, cls.MANIFEST), encoding="utf-8") as f:
+                return json.load(f)["current"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load(cls, directory, mmap=True, encoder=None):
+        """Load a persisted vector index; None if absent or unreadable.
+
+        ``encoder`` is reused instead of loading the model again when it is
+        the model the index was built with.
+        """
+        try:
+            with open(os.path.join(directory, cls.MANIFEST), encoding="utf-8") as f:
+                version_dir = os.path.join(directory, json.load(f)["current"])
+            with open(os.path.join(version_dir, "vectors.json"), encoding="utf-8") as f:
+                header = json.load(f)
+            arrays = [np.load(os.path.join(version_dir, name + ".npy"), mmap_mode="r" if mmap else None)
+                      for name in cls.ARRAYS]
+            encoder = load_encoder(version_dir, header["encoder"], reuse=encoder)
+        except (OSError, ValueError, KeyError):
+            return None
+        index = cls(encoder, *arrays, header["num_cases"], header["trained_size"], header["generation"])
+        index.name = os.path.basename(version_dir)
+        return index
+
+    def search(self, query, paragraph_index, case_mask=None, nprobe=DEFAULT_NPROBE,
+               num_candidates=SEMANTIC_CANDIDATES):
+        """Find the paragraphs closest in meaning to ``query``.
+
+        Only paragraphs known to ``paragraph_index`` (and, with ``case_mask``,
+        of cases where it is true) are returned. When the filters leave too
+        few candidates in the closest ``nprobe`` lists, more lists are probed.
+        Returns ``(para_ids, scores)`` sorted by paragraph id, like
+        ParagraphIndex.score, with cosine similarities as scores.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query_vector = self.encoder.encode([query])[0]
+        if not self.num_docs or not query_vector.any():
+            return empty
+
+        list_order = np.argsort(-(self.centroids @ query_vector))
+        candidates, probed = [], 0
+        while probed < len(list_order) and (probed < nprobe or sum(map(len, candidates)) < num_candidates):
+            lists = list_order[probed:probed + nprobe]
+            probed += len(lists)
+            ids = np.concatenate([self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+            # The vectors may already cover paragraphs this corpus snapshot doesn't know yet
+            ids = ids[ids < paragraph_index.num_docs]
+            if case_mask is not None and len(ids):
+                rows, _ = paragraph_index.locate(ids)
+                ids = ids[case_mask[rows]]
+            candidates.append(ids)
+        ids = np.concatenate(candidates)
+        if len(ids) == 0:
+            return empty
+
+        scores = (self.codes[ids].astype(np.float32) @ query_vector) * self.scales[ids]
+        keep = top_k_indices(scores, num_candidates)
+        ids, scores = ids[keep], scores[keep]
+        order = np.argsort(ids)
+        return ids[order], scores[order].astype(np.float32)